@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from apps.task.forms import SeanceForm
-from apps.task.models import Film, Seance, Room, Seat
+from apps.task.models import Film, Seance, Room, Seat, PriceTier
 
 
 class RoomAdmin(admin.ModelAdmin):
@@ -37,7 +37,14 @@ class SeanceAdmin(admin.ModelAdmin):
     list_display = ('film', 'room', 'date', 'start_time', )
 
 
+class PriceTierAdmin(admin.ModelAdmin):
+    list_display = ('film', 'seance', 'category', 'price')
+    list_filter = ('category', )
+    raw_id_fields = ('seance', )
+
+
 admin.site.register(Room, RoomAdmin)
 admin.site.register(Seat, SeatAdmin)
 admin.site.register(Film, FilmAdmin)
 admin.site.register(Seance, SeanceAdmin)
+admin.site.register(PriceTier, PriceTierAdmin)
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class TaskConfig(AppConfig):
-    name = 'task'
+    name = 'apps.task'
+
+    def ready(self):
+        from apps.task import signals  # noqa: F401
@@ -0,0 +1,73 @@
+import json
+from collections import defaultdict
+
+from django.db import transaction
+
+from apps.task.caching import bump_catalogue_version_on_commit
+from apps.task.models import ArchivedSeance, Booking, Hold, Notification, PriceTier, Reserve, Seance
+from apps.task.schedule import bump_schedule_generation_on_commit
+
+ARCHIVE_CHUNK_SIZE = 500
+
+
+def archivable_seances(cutoff):
+    return Seance.objects.filter(date__lt=cutoff).order_by('id')
+
+
+def pack_bookings(seance_ids):
+    packed = defaultdict(list)
+    rows = Booking.objects.filter(seance_id__in=seance_ids).order_by('id').values_list(
+        'seance_id', 'seat_id', 'seat__row', 'seat__column', 'seat__category', 'user_id', 'price'
+    )
+    for seance_id, *booking, price in rows:
+        packed[seance_id].append(booking + [str(price)])
+    return packed
+
+
+def archive_chunk(seances):
+    """Copy one chunk of seances with their bookings to ``ArchivedSeance`` and delete them from the hot tables.
+
+    Dependent rows are removed with raw deletes: the per-row delete signals would otherwise load every booking and
+    publish a seat release for seances that nobody can book any more. Seance price tiers go too, each booking
+    already keeps the price it was sold at.
+    """
+    seance_ids = [seance['id'] for seance in seances]
+    packed = pack_bookings(seance_ids)
+    archived = [
+        ArchivedSeance(
+            seance_id=seance['id'], room_id=seance['room_id'], room_name=seance['room__room_name'],
+            film_id=seance['film_id'], film_name=seance['film__name'], date=seance['date'],
+            start_time=seance['start_time'], capacity=seance['capacity'], booked_count=len(packed[seance['id']]),
+            revenue=seance['revenue'],
+            bookings=json.dumps(packed[seance['id']], separators=(',', ':')),
+        )
+        for seance in seances
+    ]
+
+    with transaction.atomic():
+        ArchivedSeance.objects.bulk_create(archived, ignore_conflicts=True)
+        Notification.objects.filter(reserve__seance_id__in=seance_ids).update(reserve=None)
+        for model in (Booking, Reserve, Hold, PriceTier):
+            queryset = model.objects.filter(seance_id__in=seance_ids)
+            queryset._raw_delete(queryset.db)
+        queryset = Seance.objects.filter(id__in=seance_ids)
+        queryset._raw_delete(queryset.db)
+        bump_catalogue_version_on_commit()
+        bump_schedule_generation_on_commit()
+    return archived
+
+
+def archive_seances(cutoff, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Archive every seance dated before ``cutoff`` one chunk per transaction, yielding each archived chunk."""
+    fields = (
+        'id', 'room_id', 'room__room_name', 'film_id', 'film__name', 'date', 'start_time', 'capacity', 'revenue',
+    )
+    while True:
+        seances = list(archivable_seances(cutoff).values(*fields)[:chunk_size])
+        if not seances:
+            return
+        yield archive_chunk(seances)
+
+
+def unpack_bookings(archived):
+    return [dict(zip(ArchivedSeance.ARCHIVED_BOOKING_FIELDS, booking)) for booking in json.loads(archived.bookings)]
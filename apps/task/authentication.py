@@ -0,0 +1,79 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+from apps.task.caching import bump_generation, get_generation
+
+TOKEN_CACHE_KEY = 'auth:token:{}'
+BASIC_CACHE_KEY = 'auth:basic:{}'
+GENERATION_CACHE_KEY = 'auth:generation:{}'
+
+
+def credentials_generation(user_id):
+    return get_generation(GENERATION_CACHE_KEY.format(user_id))
+
+
+def revoke_cached_credentials(user_id):
+    """Invalidate every cached token and password check of the user at once."""
+    bump_generation(GENERATION_CACHE_KEY.format(user_id))
+
+
+class CachedCredentialsMixin:
+    """Remembers successful authentications for AUTH_CACHE_TTL seconds, tagged with the user's generation.
+
+    The generation is read before the credentials are checked against the database, so a revocation landing in
+    between leaves the entry already stale instead of caching the old credentials under the new generation.
+    """
+
+    def get_cached(self, cache_key):
+        cached = cache.get(cache_key)
+        if cached is None:
+            return None
+        generation, credentials = cached
+        if generation != credentials_generation(credentials[0].pk):
+            return None
+        return credentials
+
+    def authenticate_cached(self, cache_key, lookup_user_id, authenticate):
+        """Cached credentials, or the result of ``authenticate()``; neither callable runs on a cache hit."""
+        credentials = self.get_cached(cache_key)
+        if credentials is not None:
+            return credentials
+        user_id = lookup_user_id()
+        generation = credentials_generation(user_id) if user_id is not None else None
+        credentials = authenticate()
+        if credentials[0].pk == user_id:
+            cache.set(cache_key, (generation, credentials), settings.AUTH_CACHE_TTL)
+        return credentials
+
+
+class CachedTokenAuthentication(CachedCredentialsMixin, TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        authenticate = super().authenticate_credentials
+        return self.authenticate_cached(
+            TOKEN_CACHE_KEY.format(key),
+            lambda: self.get_model().objects.filter(key=key).values_list('user_id', flat=True).first(),
+            lambda: authenticate(key),
+        )
+
+
+class BearerTokenAuthentication(CachedTokenAuthentication):
+    keyword = 'Bearer'
+
+
+class CachedBasicAuthentication(CachedCredentialsMixin, BasicAuthentication):
+
+    def authenticate_credentials(self, userid, password, request=None):
+        digest = hmac.new(settings.SECRET_KEY.encode(), '{}:{}'.format(userid, password).encode(), hashlib.sha256)
+        authenticate = super().authenticate_credentials
+        User = get_user_model()
+        return self.authenticate_cached(
+            BASIC_CACHE_KEY.format(digest.hexdigest()),
+            lambda: User._default_manager.filter(**{User.USERNAME_FIELD: userid}).values_list('pk', flat=True).first(),
+            lambda: authenticate(userid, password, request),
+        )
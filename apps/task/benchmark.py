@@ -0,0 +1,228 @@
+import bisect
+import datetime
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.task.instrumentation import QueryRecorder, percentile
+from apps.task.models import Room, Seat, Film, Seance, Booking, Reserve, User, seance_bounds
+
+PREFIX = 'bench-'
+BATCH_SIZE = 400
+SHOW_TIMES = (datetime.time(10), datetime.time(13), datetime.time(16), datetime.time(19), datetime.time(22))
+
+
+def unthrottled():
+    """Lift the booking token buckets, for load tests that measure booking rather than throttling."""
+    return override_settings(BOOKING_USER_BUCKET=None, BOOKING_SEANCE_BUCKET=None)
+
+
+def clear_dataset():
+    User.objects.filter(username__startswith=PREFIX).delete()
+    Seance.objects.filter(film__name__startswith=PREFIX).delete()
+    Film.objects.filter(name__startswith=PREFIX).delete()
+    Room.objects.filter(room_name__startswith=PREFIX).delete()
+
+
+def seed_dataset(rooms=10, rows=15, columns=20, films=30, days=30, users=500, bookings=200000, reserves=5000):
+    """Bulk-insert a synthetic cinema: seat grids, a month of seances, booked seats and reserves.
+
+    Counters are computed up front so ``booked_count`` is right without a recount pass.
+    """
+    clear_dataset()
+    random.seed(0)
+    with transaction.atomic():
+        Room.objects.bulk_create([Room(room_name='{}room-{}'.format(PREFIX, number)) for number in range(rooms)])
+        room_ids = list(Room.objects.filter(room_name__startswith=PREFIX).values_list('id', flat=True))
+        Seat.objects.bulk_create([
+            Seat(room_id=room_id, row=row, column=column)
+            for room_id in room_ids
+            for row in range(1, rows + 1)
+            for column in range(1, columns + 1)
+        ], batch_size=BATCH_SIZE)
+        seats = defaultdict(list)
+        for seat_id, room_id in Seat.objects.filter(room_id__in=room_ids).values_list('id', 'room_id'):
+            seats[room_id].append(seat_id)
+
+        Film.objects.bulk_create([
+            Film(name='{}film-{}'.format(PREFIX, number), duration=datetime.time(random.choice((1, 2)), 30))
+            for number in range(films)
+        ])
+        film_list = list(Film.objects.filter(name__startswith=PREFIX))
+
+        today = timezone.localdate()
+        planned = []
+        for day in range(days):
+            date = today + datetime.timedelta(days=day)
+            for room_id in room_ids:
+                for start_time in SHOW_TIMES:
+                    film = random.choice(film_list)
+                    planned.append(Seance(
+                        room_id=room_id, film=film, date=date, start_time=start_time,
+                        ends_at=seance_bounds(date, start_time, film.duration)[1], capacity=len(seats[room_id]),
+                    ))
+        per_seance = min(rows * columns, bookings // max(len(planned), 1))
+        for seance in planned:
+            seance.booked_count = per_seance
+        Seance.objects.bulk_create(planned, batch_size=BATCH_SIZE)
+        seance_rows = list(Seance.objects.filter(film__name__startswith=PREFIX).values_list('id', 'room_id'))
+
+        password = make_password('bench')
+        User.objects.bulk_create([
+            User(username='{}user-{}'.format(PREFIX, number), password=password) for number in range(users)
+        ], batch_size=BATCH_SIZE)
+        user_ids = list(User.objects.filter(username__startswith=PREFIX).values_list('id', flat=True))
+        tokens = [Token(user_id=user_id) for user_id in user_ids]
+        for token in tokens:
+            token.key = token.generate_key()
+        Token.objects.bulk_create(tokens, batch_size=BATCH_SIZE)
+
+        pending = []
+        for seance_id, room_id in seance_rows:
+            for seat_id in random.sample(seats[room_id], per_seance):
+                pending.append(Booking(seance_id=seance_id, seat_id=seat_id, user_id=random.choice(user_ids)))
+            if len(pending) >= 10 * BATCH_SIZE:
+                Booking.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+                pending = []
+        Booking.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+
+        reserved = set()
+        for _ in range(reserves):
+            seance_id, room_id = random.choice(seance_rows)
+            reserved.add((seance_id, random.choice(seats[room_id]), random.choice(user_ids)))
+        Reserve.objects.bulk_create([
+            Reserve(seance_id=seance_id, seat_id=seat_id, user_id=user_id) for seance_id, seat_id, user_id in reserved
+        ], batch_size=BATCH_SIZE)
+
+    return {
+        'rooms': len(room_ids),
+        'seats': sum(len(room_seats) for room_seats in seats.values()),
+        'films': len(film_list),
+        'seances': len(seance_rows),
+        'users': len(user_ids),
+        'bookings': per_seance * len(seance_rows),
+        'reserves': len(reserved),
+    }
+
+
+class Workload:
+    """Weighted mix of requests against the seeded dataset; each call returns ``(scenario, method, path, data)``."""
+
+    def __init__(self):
+        self.film_ids = list(Film.objects.filter(name__startswith=PREFIX).values_list('id', flat=True))
+        self.seances = list(Seance.objects.filter(film__name__startswith=PREFIX).values_list('id', 'room_id'))
+        self.seats = defaultdict(list)
+        room_ids = {room_id for _, room_id in self.seances}
+        for seat_id, room_id in Seat.objects.filter(room_id__in=room_ids).values_list('id', 'room_id'):
+            self.seats[room_id].append(seat_id)
+        if not self.seances:
+            raise ValueError('No benchmark data, run seed_benchmark first')
+        self.scenarios = [
+            ('film list', 10, self.film_list),
+            ('seance list', 20, self.seance_list),
+            ('seance detail', 25, self.seance_detail),
+            ('booking list', 15, self.booking_list),
+            ('my bookings', 10, self.my_bookings),
+            ('booking create', 20, self.booking_create),
+            ('reserve create', 10, self.reserve_create),
+        ]
+        self.cumulative_weights = list(accumulate(weight for _, weight, _ in self.scenarios))
+
+    def __call__(self):
+        # random.choices only arrived in Python 3.6
+        point = random.random() * self.cumulative_weights[-1]
+        name, _, build = self.scenarios[bisect.bisect(self.cumulative_weights, point)]
+        return (name, ) + build()
+
+    def random_seat(self):
+        seance_id, room_id = random.choice(self.seances)
+        return {'seance': seance_id, 'seat': random.choice(self.seats[room_id])}
+
+    def film_list(self):
+        return 'get', '/film/', None
+
+    def seance_list(self):
+        return 'get', '/seance/?film_id={}'.format(random.choice(self.film_ids)), None
+
+    def seance_detail(self):
+        return 'get', '/seance/{}/'.format(random.choice(self.seances)[0]), None
+
+    def booking_list(self):
+        return 'get', '/booking/?expand=seance', None
+
+    def my_bookings(self):
+        return 'get', '/booking/mine/?when={}'.format(random.choice(('upcoming', 'past'))), None
+
+    def booking_create(self):
+        return 'post', '/booking/', self.random_seat()
+
+    def reserve_create(self):
+        return 'post', '/reserve/', self.random_seat()
+
+
+def run_workload(workload, workers=8, requests=200, host='localhost'):
+    """Run the workload from ``workers`` threads with the booking throttles lifted, reporting per scenario."""
+    tokens = list(Token.objects.filter(user__username__startswith=PREFIX).values_list('key', flat=True)[:workers])
+    samples = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+
+    def worker(token):
+        client = Client(SERVER_NAME=host, HTTP_AUTHORIZATION='Token {}'.format(token))
+        try:
+            for _ in range(requests):
+                name, method, path, data = workload()
+                recorder = QueryRecorder()
+                started = time.perf_counter()
+                try:
+                    with connection.execute_wrapper(recorder):
+                        status_code = getattr(client, method)(path, data).status_code
+                except Exception as error:
+                    status_code = type(error).__name__
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    samples[name].append((elapsed, recorder.count))
+                    statuses[name][status_code] += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(token, )) for token in tokens]
+    with unthrottled():
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    scenarios = {}
+    for name, values in sorted(samples.items()):
+        latencies = [latency for latency, _ in values]
+        scenarios[name] = {
+            'requests': len(values),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+            },
+            'queries_mean': round(sum(queries for _, queries in values) / len(values), 2),
+            'queries_max': max(queries for _, queries in values),
+            'statuses': {str(status_code): count for status_code, count in statuses[name].items()},
+        }
+    total = sum(len(values) for values in samples.values())
+    return {
+        'workers': len(tokens),
+        'requests': total,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0,
+        'scenarios': scenarios,
+    }
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.task.caching import bump_catalogue_version_on_commit
+from apps.task.exceptions import SeatConflict
+from apps.task.models import Booking, Hold, Reserve
+from apps.task.occupancy import adjust_booked_count
+from apps.task.outbox import enqueue_seat_released
+from apps.task.pricing import price_seats
+from apps.task.realtime import BOOKED, publish_on_commit
+
+MAX_BULK_SEATS = 10
+
+
+@contextmanager
+def seat_conflict_guard(message=None):
+    """Run the block in a savepoint and turn a (seance, seat) uniqueness violation into a 409."""
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError:
+        raise SeatConflict({'error_message': message} if message else None)
+
+
+def check_not_held_by_others(user, seance, seat_ids):
+    held = Hold.objects.active().filter(seance=seance, seat_id__in=seat_ids).exclude(user=user)
+    if held.exists():
+        raise SeatConflict({'error_message': 'That seat is held by another user'})
+
+
+def book_seat(user, seance, seat):
+    with seat_conflict_guard():
+        check_not_held_by_others(user, seance, [seat.id])
+        Hold.objects.filter(seance=seance, seat=seat).delete()
+        _, price = price_seats(seance, [seat.id])[seat.id]
+        booking = Booking.objects.create(user=user, seance=seance, seat=seat, price=price)
+        adjust_booked_count(seance.id, 1, price)
+        return booking
+
+
+def book_seats(user, seance, seat_ids):
+    with seat_conflict_guard('Have already booked one of those seats'):
+        check_not_held_by_others(user, seance, seat_ids)
+        Hold.objects.filter(seance=seance, seat_id__in=seat_ids).delete()
+        prices = price_seats(seance, seat_ids)
+        bookings = Booking.objects.bulk_create([
+            Booking(user=user, seance=seance, seat_id=seat_id, price=prices[seat_id][1]) for seat_id in seat_ids
+        ])
+        adjust_booked_count(seance.id, len(bookings), sum(booking.price for booking in bookings))
+        bump_catalogue_version_on_commit()
+        publish_on_commit(seance.id, [(seat_id, BOOKED) for seat_id in seat_ids])
+        return bookings
+
+
+def hold_seat(user, seance, seat):
+    with seat_conflict_guard('That seat is already held'):
+        if Booking.objects.filter(seance=seance, seat=seat).exists():
+            raise SeatConflict()
+
+        Hold.objects.expired().filter(seance=seance, seat=seat).delete()
+        expires_at = timezone.now() + timedelta(seconds=settings.SEAT_HOLD_TTL)
+        return Hold.objects.create(user=user, seance=seance, seat=seat, expires_at=expires_at)
+
+
+def checkout_hold(hold):
+    if hold.is_expired:
+        raise SeatConflict({'error_message': 'That hold has expired'})
+
+    with seat_conflict_guard():
+        hold.delete()
+        _, price = price_seats(hold.seance, [hold.seat_id])[hold.seat_id]
+        booking = Booking.objects.create(
+            user_id=hold.user_id, seance_id=hold.seance_id, seat_id=hold.seat_id, price=price
+        )
+        adjust_booked_count(hold.seance_id, 1, price)
+        return booking
+
+
+def cancel_booking(booking):
+    with transaction.atomic():
+        booking.delete()
+        adjust_booked_count(booking.seance_id, -1, -booking.price)
+        enqueue_seat_released(booking.seance_id, booking.seat_id)
+
+
+def sweep_expired(chunk_size):
+    """Delete expired holds and waitlist rows of past seances in chunks, returning the number of rows removed."""
+    swept = 0
+    for queryset in (Hold.objects.expired(), Reserve.objects.filter(seance__date__lt=timezone.localdate())):
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            queryset.model.objects.filter(id__in=ids).delete()
+            swept += len(ids)
+    return swept
@@ -0,0 +1,64 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+CATALOGUE_HITS_KEY = 'catalogue:hits'
+CATALOGUE_MISSES_KEY = 'catalogue:misses'
+
+
+def increment(key, initial=1):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, initial, timeout=None):
+            return initial
+        return cache.incr(key)
+
+
+def get_generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        # Seeded from the clock so a generation lost to eviction never comes back with an old number
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key):
+    increment(key, initial=int(time.time() * 1000))
+
+
+def get_catalogue_version():
+    return get_generation(CATALOGUE_VERSION_KEY)
+
+
+def bump_catalogue_version():
+    bump_generation(CATALOGUE_VERSION_KEY)
+
+
+def bump_catalogue_version_on_commit():
+    transaction.on_commit(bump_catalogue_version)
+
+
+def catalogue_cache_key(request, version):
+    query = urlencode(sorted((key, sorted(values)) for key, values in request.query_params.lists()), doseq=True)
+    return 'catalogue:{}:{}?{}'.format(version, request.path, query)
+
+
+def catalogue_etag(cache_key):
+    return '"{}"'.format(hashlib.md5(cache_key.encode()).hexdigest())
+
+
+def record_catalogue_lookup(hit):
+    increment(CATALOGUE_HITS_KEY if hit else CATALOGUE_MISSES_KEY)
+
+
+def catalogue_cache_stats():
+    hits = cache.get(CATALOGUE_HITS_KEY, 0)
+    misses = cache.get(CATALOGUE_MISSES_KEY, 0)
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else 0.0}
@@ -0,0 +1,108 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+# Credentials and sessions are always read from the primary: replica lag would reject a token issued a moment ago
+# or accept one that was just revoked
+PRIMARY_ONLY_APPS = ('auth', 'authtoken', 'sessions')
+
+
+def replica_alias():
+    alias = settings.DATABASE_REPLICA_ALIAS
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def _route_reads(replica):
+    previous = getattr(_state, 'replica', False)
+    _state.replica = replica
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def use_replica():
+    """Route the reads made by this thread inside the block to the replica, when one is configured."""
+    return _route_reads(True)
+
+
+def use_primary():
+    """Keep the reads made by this thread inside the block on the primary, even within ``use_replica()``."""
+    return _route_reads(False)
+
+
+class ReplicaRouter:
+    """Sends reads to the replica only inside ``use_replica()``; everything else, and all writes, use default.
+
+    Reads outside the block stay on the primary so a request always sees its own writes, and PRIMARY_ONLY_APPS
+    stay there even inside it.
+    """
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'replica', False) and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return replica_alias() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def check_connections(**kwargs):
+    """``request_started`` receiver pinging persistent connections idle for more than DB_HEALTH_CHECK_SECONDS.
+
+    Django 2.2 only drops a persistent connection after an error; a server-side timeout would otherwise surface as
+    a failed query on the next request.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        last_checked = getattr(connection, 'health_checked_at', None)
+        if last_checked is not None and now - last_checked < settings.DB_HEALTH_CHECK_SECONDS:
+            continue
+        if not connection.is_usable():
+            connection.close()
+        connection.health_checked_at = now
+
+
+class ConnectionPool:
+    """Bounds the persistent connections of a threaded worker to ``size``.
+
+    At most ``size`` requests use the database at once, and only ``size`` threads keep their connection open
+    between requests; any other thread closes its connection when its request ends.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.keepers = set()
+
+    def acquire(self):
+        return self.slots.acquire(timeout=self.timeout)
+
+    def release(self):
+        try:
+            ident = threading.get_ident()
+            connected = any(connection.connection is not None for connection in connections.all())
+            with self.lock:
+                keep = connected and (ident in self.keepers or len(self.keepers) < self.size)
+                if keep:
+                    self.keepers.add(ident)
+                else:
+                    self.keepers.discard(ident)
+            if connected and not keep:
+                for connection in connections.all():
+                    connection.close()
+        finally:
+            self.slots.release()
@@ -0,0 +1,20 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+
+
+class SeatConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = {'error_message': 'Have already booked that seat'}
+    default_code = 'seat_conflict'
+
+
+class InWaitingRoom(Throttled):
+    default_code = 'waiting_room'
+
+    def __init__(self, queue):
+        super().__init__(wait=queue['retry_after'])
+        self.detail = {'error_message': 'That seance is in a waiting room, retry once admitted', 'queue': queue}
+
+
+class LayoutError(Exception):
+    pass
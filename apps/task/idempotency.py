@@ -0,0 +1,62 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def idempotency_cache_key(user_id, path, key):
+    digest = hashlib.sha256('{}\n{}'.format(path, key).encode()).hexdigest()
+    return 'idempotency:{}:{}'.format(user_id, digest)
+
+
+def request_fingerprint(method, data):
+    if hasattr(data, 'lists'):
+        data = {name: values for name, values in data.lists()}
+    payload = json.dumps([method, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_replay(request):
+    """Whether the request carries an Idempotency-Key whose response is already stored and will be replayed."""
+    key = request.META.get(IDEMPOTENCY_HEADER)
+    return bool(key) and stored_response(idempotency_cache_key(request.user.pk, request.path, key)) is not None
+
+
+def acquire(cache_key):
+    return cache.add(cache_key + ':lock', True, timeout=settings.IDEMPOTENCY_LOCK_SECONDS)
+
+
+def release(cache_key):
+    cache.delete(cache_key + ':lock')
+
+
+def stored_response(cache_key):
+    return cache.get(cache_key)
+
+
+def store_response(cache_key, fingerprint, response):
+    cache.set(cache_key, {
+        'fingerprint': fingerprint,
+        'status': response.status_code,
+        'data': response.data,
+        'location': response.get('Location'),
+    }, settings.IDEMPOTENCY_TTL)
+
+
+def wait_for_response(cache_key):
+    """Poll for the response of a concurrent request holding the same key, ``None`` if it does not finish in time."""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        stored = stored_response(cache_key)
+        if stored is not None:
+            return stored
+        if cache.get(cache_key + ':lock') is None:
+            return None
+    return None
@@ -0,0 +1,89 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+def sql_template(sql):
+    return NUMBER.sub('N', PLACEHOLDER_LIST.sub('(...)', sql))
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    index = max(0, min(len(ordered) - 1, int(round(rank / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` callable that counts, times and groups the SQL of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.templates[sql_template(sql)] += 1
+
+    def repeated(self, threshold):
+        return {template: count for template, count in self.templates.items() if count > threshold}
+
+
+class EndpointRegistry:
+    """In-memory per-endpoint samples, bounded per endpoint, aggregated into percentiles on demand."""
+    metrics = ('queries', 'sql_ms', 'view_ms', 'render_ms', 'total_ms', 'bytes')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.samples = defaultdict(lambda: deque(maxlen=settings.INSTRUMENTATION_SAMPLES))
+        self.requests = Counter()
+        self.n_plus_one = defaultdict(Counter)
+
+    def reset(self):
+        with self.lock:
+            self.clear()
+
+    def record(self, endpoint, sample, repeated):
+        with self.lock:
+            self.samples[endpoint].append(sample)
+            self.requests[endpoint] += 1
+            for template, count in repeated.items():
+                self.n_plus_one[endpoint][template] = max(self.n_plus_one[endpoint][template], count)
+
+    def report(self):
+        with self.lock:
+            snapshot = {endpoint: list(samples) for endpoint, samples in self.samples.items()}
+            n_plus_one = {endpoint: dict(templates) for endpoint, templates in self.n_plus_one.items()}
+            requests = dict(self.requests)
+
+        report = {}
+        for endpoint, samples in sorted(snapshot.items()):
+            report[endpoint] = {'requests': requests[endpoint], 'n_plus_one': n_plus_one.get(endpoint, {})}
+            for metric in self.metrics:
+                values = [sample[metric] for sample in samples]
+                report[endpoint][metric] = {
+                    'p50': percentile(values, 50), 'p95': percentile(values, 95), 'p99': percentile(values, 99),
+                }
+        return report
+
+
+registry = EndpointRegistry()
@@ -0,0 +1,62 @@
+import datetime
+import gzip
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.task.archiving import ARCHIVE_CHUNK_SIZE, archivable_seances, archive_seances, unpack_bookings
+
+
+class Command(BaseCommand):
+    help = 'Move seances older than a cutoff, with their bookings, from the hot tables into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Archive seances dated more than this many days ago')
+        parser.add_argument('--before', help='Archive seances dated before this YYYY-MM-DD instead')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+        parser.add_argument('--dump', help='Also append the archived seances to this gzipped JSON lines file')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the seances that would be archived')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = parse_date(options['before'])
+            except ValueError:
+                cutoff = None
+            if cutoff is None:
+                raise CommandError('--before must be a YYYY-MM-DD date')
+        else:
+            cutoff = timezone.localdate() - datetime.timedelta(days=options['days'])
+
+        if options['dry_run']:
+            self.stdout.write('{} seances dated before {} would be archived.'.format(
+                archivable_seances(cutoff).count(), cutoff
+            ))
+            return
+
+        dump = gzip.open(options['dump'], 'at', encoding='utf-8') if options['dump'] else None
+        seances = bookings = 0
+        try:
+            for archived in archive_seances(cutoff, options['chunk_size']):
+                seances += len(archived)
+                bookings += sum(seance.booked_count for seance in archived)
+                if dump:
+                    for seance in archived:
+                        dump.write(json.dumps({
+                            'seance_id': seance.seance_id, 'date': seance.date.isoformat(),
+                            'start_time': seance.start_time.isoformat(), 'room_id': seance.room_id,
+                            'room_name': seance.room_name, 'film_id': seance.film_id, 'film_name': seance.film_name,
+                            'capacity': seance.capacity, 'revenue': str(seance.revenue),
+                            'bookings': unpack_bookings(seance),
+                        }) + '\n')
+                if options['verbosity'] > 1:
+                    self.stdout.write('Archived {} seances so far'.format(seances))
+        finally:
+            if dump:
+                dump.close()
+
+        self.stdout.write('Archived {} seances dated before {} with {} bookings.'.format(seances, cutoff, bookings))
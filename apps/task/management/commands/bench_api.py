@@ -0,0 +1,68 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.task.benchmark import Workload, run_workload
+
+
+class Command(BaseCommand):
+    help = 'Drive the API with concurrent clients against the seed_benchmark dataset and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per worker')
+        parser.add_argument('--output', help='Save the results as JSON to this file')
+        parser.add_argument('--baseline', help='Earlier --output file to compare p95 latency and queries against')
+        parser.add_argument('--label', default='', help='Free-form note stored with the results')
+
+    def handle(self, *args, **options):
+        try:
+            workload = Workload()
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['verbosity'] < 2:
+            # Expected 4xx responses and SQLite lock errors would otherwise log a traceback per request.
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        results = run_workload(workload, options['workers'], options['requests'], host)
+        results.update({
+            'label': options['label'],
+            'database': connection.vendor,
+            'created_at': timezone.now().isoformat(),
+        })
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)['scenarios']
+
+        self.stdout.write('{} workers, {} requests on {} in {}s: {} req/s'.format(
+            results['workers'], results['requests'], results['database'], results['elapsed_s'],
+            results['throughput_rps'],
+        ))
+        self.stdout.write('{:<16} {:>6} {:>9} {:>9} {:>9} {:>9} {:>6}  {}'.format(
+            'scenario', 'reqs', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'max', 'statuses'
+        ))
+        for name, stats in results['scenarios'].items():
+            latency = stats['latency_ms']
+            self.stdout.write('{:<16} {:>6} {:>9} {:>9} {:>9} {:>9} {:>6}  {}'.format(
+                name, stats['requests'], latency['p50'], latency['p95'], latency['p99'],
+                stats['queries_mean'], stats['queries_max'],
+                ' '.join('{}:{}'.format(code, count) for code, count in sorted(stats['statuses'].items())),
+            ))
+            if name in baseline:
+                before = baseline[name]
+                self.stdout.write('{:<16} p95 {:+.2f} ms, queries {:+.2f}'.format(
+                    '', latency['p95'] - before['latency_ms']['p95'], stats['queries_mean'] - before['queries_mean']
+                ))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write('Saved results to {}'.format(options['output']))
@@ -0,0 +1,38 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.task.occupancy import RoomLayout, SeatMap
+from apps.task.recommendation import recommend_blocks
+
+
+class Command(BaseCommand):
+    help = 'Time the contiguous seat block search on a synthetic room'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20)
+        parser.add_argument('--columns', type=int, default=25)
+        parser.add_argument('--occupancy', type=float, default=0.6)
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows, columns = options['rows'], options['columns']
+        layout = RoomLayout(
+            (row * columns + column, row, column)
+            for row in range(1, rows + 1)
+            for column in range(1, columns + 1)
+        )
+        seat_map = SeatMap(layout)
+        for seat_id in random.sample(layout.seat_ids, int(len(layout) * options['occupancy'])):
+            seat_map.mark(seat_id)
+
+        self.stdout.write('{} seats, {:.0%} occupied'.format(len(layout), options['occupancy']))
+        for seats in (1, 2, 4, 6, 10):
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                blocks = recommend_blocks(seat_map, seats, limit=5)
+            elapsed = (time.perf_counter() - started) / options['iterations']
+            self.stdout.write('{:>2} seats: {:>7.3f} ms per search, {} blocks'.format(
+                seats, elapsed * 1000, len(blocks)
+            ))
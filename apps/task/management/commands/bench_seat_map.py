@@ -0,0 +1,82 @@
+import random
+import time
+from collections import OrderedDict
+from datetime import date, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.task.models import Room, Seat, Film, Seance, Booking, User
+from apps.task.occupancy import build_seat_maps
+
+BATCH_SIZE = 400
+
+
+def legacy_chairs(seance):
+    chairs = OrderedDict()
+    seats = Seat.objects.filter(room=seance.room.id).prefetch_related('booking_set')
+    for seat_instance in seats:
+        booking = seat_instance.booking_set.first()
+        chairs[seat_instance.id] = True if booking else False
+    return chairs
+
+
+class Command(BaseCommand):
+    help = 'Compare per-seat queries with the seat map bitmap when rendering seance chairs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=15)
+        parser.add_argument('--columns', type=int, default=20)
+        parser.add_argument('--seances', type=int, default=500)
+        parser.add_argument('--occupancy', type=float, default=0.4)
+        parser.add_argument(
+            '--legacy-seances', type=int, default=20,
+            help='The per-seat path prefetches bookings of every seance, so only time it on a sample',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seances = self.seed(options)
+            sample = seances[:options['legacy_seances']]
+            self.measure('per-seat queries', len(sample), lambda: [legacy_chairs(seance) for seance in sample])
+            self.measure('seat map bitmap', len(seances), lambda: [
+                seat_map.chairs() for seat_map in build_seat_maps(seances).values()
+            ])
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        user = User.objects.create(username='bench-seat-map')
+        room = Room.objects.create(room_name='Bench room')
+        film = Film.objects.create(name='Bench film', duration=dt_time(2, 0))
+        Seat.objects.bulk_create([
+            Seat(room=room, row=row, column=column)
+            for row in range(1, options['rows'] + 1)
+            for column in range(1, options['columns'] + 1)
+        ], batch_size=BATCH_SIZE)
+        seat_ids = list(Seat.objects.filter(room=room).values_list('id', flat=True))
+
+        start = date.today()
+        Seance.objects.bulk_create([
+            Seance(room=room, film=film, date=start + timedelta(days=number), start_time=dt_time(12, 0))
+            for number in range(options['seances'])
+        ], batch_size=BATCH_SIZE)
+        seances = list(Seance.objects.filter(room=room).select_related('room'))
+
+        booked = int(len(seat_ids) * options['occupancy'])
+        Booking.objects.bulk_create([
+            Booking(seance=seance, seat_id=seat_id, user=user)
+            for seance in seances
+            for seat_id in random.sample(seat_ids, booked)
+        ], batch_size=BATCH_SIZE)
+        return seances
+
+    def measure(self, label, count, render):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            render()
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write('{:<18} {:>5} seances {:>10.1f} ms {:>8.3f} ms/seance {:>8} queries'.format(
+            label, count, elapsed * 1000, elapsed * 1000 / max(count, 1), len(queries)
+        ))
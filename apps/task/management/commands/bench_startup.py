@@ -0,0 +1,68 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per sample: times django.setup() and loading the WSGI app and URLconf the way a
+# worker does before its first request, then reports peak RSS.
+PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+ready = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - started) * 1000,
+    'ready_ms': (ready - started) * 1000,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold start time, peak RSS and imported modules of a worker process for each settings profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=['cinema_project.settings', 'cinema_project.settings_api'])
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            samples = [self.probe(profile) for _ in range(options['runs'])]
+            results[profile] = {
+                metric: round(statistics.median(sample[metric] for sample in samples), 1)
+                for metric in ('setup_ms', 'ready_ms', 'rss_kb', 'modules')
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('{:<32} {:>10} {:>10} {:>10} {:>8}'.format(
+            'profile', 'setup ms', 'ready ms', 'RSS MB', 'modules'
+        ))
+        for profile, stats in results.items():
+            self.stdout.write('{:<32} {:>10} {:>10} {:>10.1f} {:>8}'.format(
+                profile, stats['setup_ms'], stats['ready_ms'], stats['rss_kb'] / 1024, int(stats['modules'])
+            ))
+
+    def probe(self, profile):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        if completed.returncode:
+            raise CommandError('{} failed to start:\n{}'.format(profile, completed.stderr))
+        return json.loads(completed.stdout.strip().splitlines()[-1])
@@ -0,0 +1,95 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, time as dt_time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.task.models import Room, Seat, Film, Seance, Booking, User
+from apps.task.throttling import WaitingRoom
+from apps.task.views import BookingViewSet
+
+
+class Command(BaseCommand):
+    help = 'Flood BookingViewSet.create for one seance and report how throttling and the waiting room shed load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--seats', type=int, default=500)
+        parser.add_argument('--waiting-room-rate', type=float, default=0,
+                            help='Open a waiting room admitting this many users per second')
+        parser.add_argument('--waiting-room-burst', type=int, default=0)
+
+    def handle(self, *args, **options):
+        cache.clear()
+        room = Room.objects.create(room_name='Throttling bench room')
+        film = Film.objects.create(name='Throttling bench film', duration=dt_time(2, 0))
+        try:
+            Seat.objects.bulk_create(
+                [Seat(room=room, row=1 + column // 25, column=1 + column % 25) for column in range(options['seats'])],
+                batch_size=400,
+            )
+            seance = Seance.objects.create(room=room, film=film, date=date.today(), start_time=dt_time(20, 0))
+            users = [
+                User.objects.create(username='throttle-bench-{}'.format(number))
+                for number in range(options['threads'])
+            ]
+            seat_ids = list(Seat.objects.filter(room=room).values_list('id', flat=True))
+            if options['waiting_room_rate']:
+                WaitingRoom(seance.id).open(options['waiting_room_rate'], options['waiting_room_burst'])
+
+            self.lock = threading.Lock()
+            self.statuses = Counter()
+            self.queries = Counter()
+            deadline = time.monotonic() + options['seconds']
+            view = BookingViewSet.as_view({'post': 'create'})
+            threads = [
+                threading.Thread(target=self.worker, args=(view, user, seance, seat_ids, deadline)) for user in users
+            ]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+
+            total = sum(self.statuses.values())
+            self.stdout.write('requests:        {} in {:.1f}s ({:.0f} req/s)'.format(total, elapsed, total / elapsed))
+            for status_code, count in sorted(self.statuses.items(), key=str):
+                self.stdout.write('status {}:      {} ({:.1f} queries each)'.format(
+                    status_code, count, self.queries[status_code] / count
+                ))
+            self.stdout.write('bookings/s:      {:.1f}'.format(
+                Booking.objects.filter(seance=seance).count() / elapsed
+            ))
+        finally:
+            WaitingRoom(seance.id).close()
+            User.objects.filter(username__startswith='throttle-bench-').delete()
+            room.delete()
+            film.delete()
+
+    def worker(self, view, user, seance, seat_ids, deadline):
+        factory = APIRequestFactory()
+        try:
+            while time.monotonic() < deadline:
+                request = factory.post('/booking/', {'seance': seance.id, 'seat': random.choice(seat_ids)})
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as queries:
+                    try:
+                        response = view(request)
+                        status_code = response.status_code
+                    except Exception as error:
+                        status_code = type(error).__name__
+                with self.lock:
+                    self.statuses[status_code] += 1
+                    self.queries[status_code] += len(queries)
+                if status_code == 429:
+                    time.sleep(min(float(response.get('Retry-After', 1)), 0.5))
+        finally:
+            connection.close()
@@ -0,0 +1,19 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from apps.task.caching import catalogue_cache_stats, get_catalogue_version
+
+
+class Command(BaseCommand):
+    help = 'Show the film/seance response cache version and hit rate'
+
+    def handle(self, *args, **options):
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            self.stderr.write('The cache is per-process locmem, so this only sees the counters of this command; '
+                              'set CACHE_BACKEND to a shared cache to read the servers\' counters.')
+        stats = catalogue_cache_stats()
+        self.stdout.write('version:  {}'.format(get_catalogue_version()))
+        self.stdout.write('hits:     {}'.format(stats['hits']))
+        self.stdout.write('misses:   {}'.format(stats['misses']))
+        self.stdout.write('hit rate: {:.1%}'.format(stats['hit_rate']))
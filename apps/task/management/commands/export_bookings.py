@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.task.reports import CSV, JSON_LINES, REPORTS, export_lines
+from apps.task.serializers import ReportFilterSerializer
+
+
+class Command(BaseCommand):
+    help = 'Stream a bookings or sales report as CSV or JSON lines without loading it into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('report', nargs='?', default='bookings', choices=sorted(REPORTS))
+        parser.add_argument('--format', dest='export', default=CSV, choices=[CSV, JSON_LINES])
+        parser.add_argument('--date-from')
+        parser.add_argument('--date-to')
+        parser.add_argument('--film')
+        parser.add_argument('--room')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        params = {
+            name: options[name]
+            for name in ('export', 'date_from', 'date_to', 'film', 'room')
+            if options[name] is not None
+        }
+        serializer = ReportFilterSerializer(data=params)
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+
+        lines = export_lines(options['report'], serializer.validated_data['export'], **serializer.filters)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,81 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from apps.task.serializers import UserImportSerializer
+
+User = get_user_model()
+HEADER = ['username', 'email', 'password']
+
+
+def hash_password(password):
+    # Spawned workers start without Django; forked ones inherit it already set up
+    if not apps.ready:
+        django.setup()
+    return make_password(password)
+
+
+class Command(BaseCommand):
+    help = 'Register users in bulk from a username,email,password CSV, hashing passwords in worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes, defaults to CPU count')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with open(options['csv_file'], newline='') as csv_file:
+            rows = [(line, row) for line, row in enumerate(csv.reader(csv_file), start=1) if row]
+        if rows and rows[0][1] == HEADER:
+            rows = rows[1:]
+
+        valid_rows = self.validate_rows(rows)
+        usernames = {row['username'] for row in valid_rows}
+        emails = {row['email'] for row in valid_rows}
+        taken = set()
+        for username, email in User.objects.filter(Q(username__in=usernames) | Q(email__in=emails)).values_list(
+            'username', 'email'
+        ):
+            taken.update((username, email))
+
+        new_rows = []
+        for row in valid_rows:
+            if row['username'] in taken or row['email'] in taken:
+                continue
+            taken.update((row['username'], row['email']))
+            new_rows.append(row)
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            hashes = executor.map(hash_password, [row['password'] for row in new_rows], chunksize=50)
+            users = [
+                User(username=row['username'], email=row['email'], password=password_hash)
+                for row, password_hash in zip(new_rows, hashes)
+            ]
+
+        User.objects.bulk_create(users, batch_size=options['batch_size'])
+        self.stdout.write('Registered {} users, skipped {} existing and {} invalid.'.format(
+            len(users), len(valid_rows) - len(users), len(rows) - len(valid_rows)
+        ))
+
+    def validate_rows(self, rows):
+        """Rows that pass the registration API's field rules; the others are reported on stderr and skipped."""
+        serializer = UserImportSerializer()
+        valid_rows = []
+        for line, row in rows:
+            if len(row) != len(HEADER):
+                self.stderr.write('Line {}: expected {} columns, got {}'.format(line, len(HEADER), len(row)))
+                continue
+            try:
+                valid_rows.append(serializer.run_validation(dict(zip(HEADER, row))))
+            except ValidationError as error:
+                self.stderr.write('Line {}: {}'.format(line, '; '.join(
+                    '{}: {}'.format(field, ' '.join(messages)) for field, messages in error.detail.items()
+                )))
+        return valid_rows
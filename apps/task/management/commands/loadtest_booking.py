@@ -0,0 +1,81 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, time as dt_time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.task.benchmark import unthrottled
+from apps.task.models import Room, Seat, Film, Seance, Booking, User
+from apps.task.views import BookingViewSet
+
+
+class Command(BaseCommand):
+    help = 'Hammer BookingViewSet.create from many threads against one seance and count double bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='Requests per thread')
+        parser.add_argument('--seats', type=int, default=100, help='Seats in the contended room')
+
+    def handle(self, *args, **options):
+        room = Room.objects.create(room_name='Load test room')
+        film = Film.objects.create(name='Load test film', duration=dt_time(2, 0))
+        try:
+            Seat.objects.bulk_create([Seat(room=room, row=1, column=column) for column in range(options['seats'])])
+            seance = Seance.objects.create(room=room, film=film, date=date.today(), start_time=dt_time(20, 0))
+            users = [
+                User.objects.create(username='load-test-{}'.format(number)) for number in range(options['threads'])
+            ]
+            seat_ids = list(Seat.objects.filter(room=room).values_list('id', flat=True))
+
+            statuses = Counter()
+            self.lock = threading.Lock()
+            view = BookingViewSet.as_view({'post': 'create'})
+            threads = [
+                threading.Thread(target=self.worker, args=(view, user, seance, seat_ids, options['requests'], statuses))
+                for user in users
+            ]
+
+            with unthrottled():
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+
+            double_booked = Booking.objects.filter(seance=seance).values('seat').annotate(
+                bookings=Count('id')
+            ).filter(bookings__gt=1).count()
+
+            total = sum(statuses.values())
+            self.stdout.write('requests:      {}'.format(total))
+            self.stdout.write('throughput:    {:.1f} req/s'.format(total / elapsed))
+            for status_code, count in sorted(statuses.items(), key=str):
+                self.stdout.write('status {}:    {}'.format(status_code, count))
+            self.stdout.write('booked seats:  {}'.format(Booking.objects.filter(seance=seance).count()))
+            self.stdout.write('double booked: {}'.format(double_booked))
+        finally:
+            User.objects.filter(username__startswith='load-test-').delete()
+            room.delete()
+            film.delete()
+
+    def worker(self, view, user, seance, seat_ids, requests, statuses):
+        factory = APIRequestFactory()
+        try:
+            for _ in range(requests):
+                request = factory.post('/booking/', {'seance': seance.id, 'seat': random.choice(seat_ids)})
+                force_authenticate(request, user=user)
+                try:
+                    status_code = view(request).status_code
+                except Exception as error:
+                    status_code = type(error).__name__
+                with self.lock:
+                    statuses[status_code] += 1
+        finally:
+            connection.close()
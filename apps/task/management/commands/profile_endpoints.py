@@ -0,0 +1,46 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from apps.task.instrumentation import registry
+
+
+class Command(BaseCommand):
+    help = 'Request endpoints in-process and print per-endpoint query, latency and N+1 statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Paths to GET, e.g. /seance/ /booking/?expand=seance')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+
+    def handle(self, *args, **options):
+        registry.reset()
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        with override_settings(INSTRUMENTATION_ENABLED=True):
+            client = Client(SERVER_NAME=host)
+            for _ in range(options['repeat']):
+                for path in options['paths']:
+                    client.get(path)
+
+        report = registry.report()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write('{:<28} {:>6} {:>14} {:>16} {:>16} {:>16} {:>10}'.format(
+            'endpoint', 'reqs', 'queries p50/99', 'sql ms p50/99', 'render ms p50/99', 'total ms p50/99', 'bytes p50'
+        ))
+        for endpoint, stats in report.items():
+            self.stdout.write('{:<28} {:>6} {:>14} {:>16} {:>16} {:>16} {:>10}'.format(
+                endpoint, stats['requests'],
+                '{}/{}'.format(stats['queries']['p50'], stats['queries']['p99']),
+                '{:.1f}/{:.1f}'.format(stats['sql_ms']['p50'], stats['sql_ms']['p99']),
+                '{:.1f}/{:.1f}'.format(stats['render_ms']['p50'], stats['render_ms']['p99']),
+                '{:.1f}/{:.1f}'.format(stats['total_ms']['p50'], stats['total_ms']['p99']),
+                stats['bytes']['p50'],
+            ))
+            for template, count in stats['n_plus_one'].items():
+                self.stdout.write('    N+1: {} x {}'.format(count, template[:160]))
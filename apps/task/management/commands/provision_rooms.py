@@ -0,0 +1,39 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.task.exceptions import LayoutError
+from apps.task.provisioning import provision_room
+
+
+class Command(BaseCommand):
+    help = 'Create or update rooms and their seat grids from a JSON layout file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('layout', help=(
+            'JSON file: {"rooms": [{"room_name": "Room 1", "rows": ["SS..SS", "VV..VV"], '
+            '"categories": {"S": "standard", "V": "vip"}}]}; "." and spaces are gaps'
+        ))
+
+    def handle(self, *args, **options):
+        with open(options['layout']) as layout_file:
+            rooms = json.load(layout_file)['rooms']
+
+        started = time.perf_counter()
+        totals = {'created': 0, 'updated': 0, 'deleted': 0}
+        for room_layout in rooms:
+            try:
+                room, stats = provision_room(
+                    room_layout['room_name'], room_layout['rows'], room_layout.get('categories')
+                )
+            except LayoutError as error:
+                raise CommandError(str(error))
+
+            for key in totals:
+                totals[key] += stats[key]
+            self.stdout.write('{}: {created} created, {updated} updated, {deleted} deleted'.format(room, **stats))
+
+        self.stdout.write('{} rooms, {created} seats created, {updated} updated, {deleted} deleted in {:.2f}s'.format(
+            len(rooms), time.perf_counter() - started, **totals
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from apps.task.models import Seance
+from apps.task.occupancy import recount_occupancy
+from apps.task.schedule import bump_schedule_generation
+
+
+class Command(BaseCommand):
+    help = 'Recompute seance capacity, booked_count and revenue counters in bulk and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted seances')
+
+    def handle(self, *args, **options):
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            seances = list(
+                Seance.objects.filter(id__gt=last_id).order_by('id').only(
+                    'id', 'room_id', 'capacity', 'booked_count', 'revenue'
+                )[:options['chunk_size']]
+            )
+            if not seances:
+                break
+            last_id = seances[-1].id
+            checked += len(seances)
+
+            drifted = recount_occupancy(seances)
+            repaired += len(drifted)
+            if drifted and not options['dry_run']:
+                Seance.objects.bulk_update(drifted, ['capacity', 'booked_count', 'revenue'])
+
+        if repaired and not options['dry_run']:
+            bump_schedule_generation()
+
+        action = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write('Checked {} seances. {} {} drifted counters.'.format(checked, action, repaired))
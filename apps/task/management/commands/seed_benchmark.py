@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.task.benchmark import clear_dataset, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert a synthetic dataset for bench_api, replacing any previous one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10)
+        parser.add_argument('--rows', type=int, default=15)
+        parser.add_argument('--columns', type=int, default=20)
+        parser.add_argument('--films', type=int, default=30)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--bookings', type=int, default=200000)
+        parser.add_argument('--reserves', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Only remove the benchmark dataset')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_dataset()
+            self.stdout.write('Removed benchmark dataset.')
+            return
+
+        started = time.perf_counter()
+        counts = seed_dataset(**{
+            name: options[name]
+            for name in ('rooms', 'rows', 'columns', 'films', 'days', 'users', 'bookings', 'reserves')
+        })
+        elapsed = time.perf_counter() - started
+        self.stdout.write('Seeded in {:.1f}s: {}'.format(
+            elapsed, ', '.join('{} {}'.format(count, name) for name, count in counts.items())
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.task.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued notifications from the outbox over one pooled mail connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--loop', action='store_true', help='Keep draining, sleeping --interval seconds when idle')
+        parser.add_argument('--interval', type=int, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent, failed = drain_outbox(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write('Sent {}, failed {}'.format(sent, failed))
+            if sent and not failed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
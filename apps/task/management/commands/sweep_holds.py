@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.task.booking import sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Release expired seat holds and drop waitlist rows of past seances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            swept = sweep_expired(options['chunk_size'])
+            self.stdout.write('Swept {} rows'.format(swept))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,91 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+
+from apps.task.database import ConnectionPool
+from apps.task.instrumentation import QueryRecorder, logger, registry
+
+
+class QueryInstrumentationMiddleware:
+    """Records query count, SQL time, view and render time and response size per resolved view.
+
+    ``view_ms`` covers the DRF handler (authentication, queries and serializer ``.data``); ``render_ms`` covers
+    turning the serialized data into the response body.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.instrumentation_view_started = None
+        request.instrumentation_view_ms = 0.0
+        request.instrumentation_render_ms = 0.0
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            return response
+
+        endpoint = '{} {}'.format(request.method, resolver_match.view_name)
+        repeated = recorder.repeated(settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD)
+        for template, count in repeated.items():
+            logger.warning('Possible N+1 in %s: %d x %s', endpoint, count, template)
+
+        registry.record(endpoint, {
+            'queries': recorder.count,
+            'sql_ms': recorder.duration * 1000,
+            'view_ms': request.instrumentation_view_ms,
+            'render_ms': request.instrumentation_render_ms,
+            'total_ms': total * 1000,
+            'bytes': 0 if response.streaming else len(response.content),
+        }, repeated)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.instrumentation_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        render_started = time.perf_counter()
+        if request.instrumentation_view_started is not None:
+            request.instrumentation_view_ms = (render_started - request.instrumentation_view_started) * 1000
+
+        def rendered(response):
+            request.instrumentation_render_ms = (time.perf_counter() - render_started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class DatabasePoolMiddleware:
+    """Admits at most DB_POOL_SIZE concurrent requests per process to the database, answering 503 past
+    DB_POOL_TIMEOUT seconds of waiting. Streaming responses give their slot back before the body is sent.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DB_POOL_SIZE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pool = ConnectionPool(settings.DB_POOL_SIZE, settings.DB_POOL_TIMEOUT)
+
+    def __call__(self, request):
+        if not self.pool.acquire():
+            response = JsonResponse({'error_message': 'Too many concurrent requests, try again'}, status=503)
+            response['Retry-After'] = str(settings.DB_POOL_TIMEOUT)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self.pool.release()
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_bookings(apps, schema_editor):
+    """Keep the earliest booking of every double-booked seat so the unique constraint can be added."""
+    Booking = apps.get_model('task', 'Booking')
+    duplicates = Booking.objects.values('seance_id', 'seat_id').annotate(
+        first_id=Min('id'), bookings=Count('id')
+    ).filter(bookings__gt=1).order_by()
+    for duplicate in duplicates:
+        Booking.objects.filter(seance_id=duplicate['seance_id'], seat_id=duplicate['seat_id']).exclude(
+            id=duplicate['first_id']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('seance', 'seat'), name='unique_booking_seance_seat'),
+        ),
+    ]
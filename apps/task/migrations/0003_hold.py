@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('task', '0002_booking_unique_seance_seat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('seance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='task.Seance')),
+                ('seat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='task.Seat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(fields=('seance', 'seat'), name='unique_hold_seance_seat'),
+        ),
+    ]
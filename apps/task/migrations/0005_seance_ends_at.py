@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:03
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seance_end(date, start_time, duration):
+    starts_at = timezone.make_aware(datetime.datetime.combine(date, start_time))
+    return starts_at + datetime.timedelta(hours=duration.hour, minutes=duration.minute, seconds=duration.second)
+
+
+def fill_ends_at(apps, schema_editor):
+    Seance = apps.get_model('task', 'Seance')
+    seances = list(Seance.objects.select_related('film'))
+    for seance in seances:
+        seance.ends_at = seance_end(seance.date, seance.start_time, seance.film.duration)
+    Seance.objects.bulk_update(seances, ['ends_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0004_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seance',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='seance',
+            index=models.Index(fields=['room', 'date', 'start_time', 'ends_at'], name='seance_room_schedule_idx'),
+        ),
+        migrations.RunPython(fill_ends_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:08
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def fill_counters(apps, schema_editor):
+    Seance = apps.get_model('task', 'Seance')
+    Seat = apps.get_model('task', 'Seat')
+    Booking = apps.get_model('task', 'Booking')
+
+    capacities = dict(Seat.objects.values_list('room_id').annotate(Count('id')).order_by())
+    booked = dict(Booking.objects.values_list('seance_id').annotate(Count('id')).order_by())
+    seances = list(Seance.objects.only('id', 'room_id'))
+    for seance in seances:
+        seance.capacity = capacities.get(seance.room_id, 0)
+        seance.booked_count = booked.get(seance.id, 0)
+    Seance.objects.bulk_update(seances, ['capacity', 'booked_count'], batch_size=500)
+
+
+def remove_duplicate_reserves(apps, schema_editor):
+    """Keep the earliest reserve of every (seance, seat, user) so the unique constraint can be added."""
+    Reserve = apps.get_model('task', 'Reserve')
+    duplicates = Reserve.objects.values('seance_id', 'seat_id', 'user_id').annotate(
+        first_id=Min('id'), reserves=Count('id')
+    ).filter(reserves__gt=1).order_by()
+    for duplicate in duplicates:
+        Reserve.objects.filter(
+            seance_id=duplicate['seance_id'], seat_id=duplicate['seat_id'], user_id=duplicate['user_id']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0005_seance_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seance',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='seance',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['seance', 'user'], name='booking_seance_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserve',
+            index=models.Index(fields=['seance', 'user'], name='reserve_seance_user_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_reserves, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reserve',
+            constraint=models.UniqueConstraint(fields=('seance', 'seat', 'user'), name='unique_reserve_seance_seat_user'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0006_occupancy_counters_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='category',
+            field=models.CharField(default='standard', max_length=20),
+        ),
+    ]
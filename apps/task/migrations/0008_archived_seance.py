@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0007_seat_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSeance',
+            fields=[
+                ('seance_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('room_id', models.IntegerField()),
+                ('room_name', models.CharField(max_length=50)),
+                ('film_id', models.IntegerField()),
+                ('film_name', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('booked_count', models.PositiveIntegerField()),
+                ('bookings', models.TextField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedseance',
+            index=models.Index(fields=['date', 'start_time'], name='archived_seance_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedseance',
+            index=models.Index(fields=['film_id', 'date'], name='archived_seance_film_idx'),
+        ),
+    ]
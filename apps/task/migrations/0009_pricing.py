@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0008_archived_seance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedseance',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='seance',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='PriceTier',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(default='standard', max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('film', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='task.Film')),
+                ('seance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='task.Seance')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pricetier',
+            constraint=models.UniqueConstraint(fields=('film', 'category'), name='unique_price_tier_film_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='pricetier',
+            constraint=models.UniqueConstraint(fields=('seance', 'category'), name='unique_price_tier_seance_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='pricetier',
+            constraint=models.CheckConstraint(check=models.Q(('film__isnull', False), ('seance__isnull', False), _connector='OR'), name='price_tier_has_target'),
+        ),
+    ]
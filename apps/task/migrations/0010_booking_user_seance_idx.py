@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0009_pricing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'seance'], name='booking_user_seance_idx'),
+        ),
+    ]
@@ -1,27 +1,153 @@
-from rest_framework.mixins import DestroyModelMixin
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, ListModelMixin, RetrieveModelMixin
+from rest_framework.response import Response
 
-from django.core.mail import send_mail as django_send_email
-
-from apps.task.models import Reserve
+from apps.task.booking import cancel_booking
+from apps.task.database import use_primary, use_replica
+from apps.task.caching import catalogue_cache_key, catalogue_etag, get_catalogue_version, record_catalogue_lookup
+from apps.task.idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, acquire, idempotency_cache_key, release, request_fingerprint, store_response,
+    stored_response, wait_for_response,
+)
 
 
 class UnbookedDestroyModelMixin(DestroyModelMixin):
     def perform_destroy(self, instance):
-        booking, deleted = instance.delete()
-
-        if deleted:
-            reserved_users = Reserve.objects.filter(
-                row=instance.row, column=instance.column, seance=instance.seance
-            ).values_list('id', 'user__email')
-
-            for key, value in reserved_users:
-                send_mail = django_send_email(
-                    'Cinema Booking',
-                    'You can booking your reserve seat',
-                    'from@example.com',
-                    [value],
-                    fail_silently=False,
+        cancel_booking(instance)
+
+
+class CachedResponseMixin:
+    """Serve read responses from the cache under the current catalogue version, with ETag revalidation.
+
+    Misses are rendered from the primary: a lagging replica could otherwise store a pre-write body under the
+    version that write bumped to, and serve it for the whole cache timeout.
+    """
+
+    def cached_response(self, render, request, *args, **kwargs):
+        cache_key = catalogue_cache_key(request, get_catalogue_version())
+        etag = catalogue_etag(cache_key)
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            record_catalogue_lookup(hit=True)
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        data = cache.get(cache_key)
+        record_catalogue_lookup(hit=data is not None)
+        if data is not None:
+            response = Response(data)
+        else:
+            with use_primary():
+                response = render(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(cache_key, response.data, settings.CATALOGUE_CACHE_TIMEOUT)
+
+        response['ETag'] = etag
+        return response
+
+
+class CachedListModelMixin(CachedResponseMixin, ListModelMixin):
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveModelMixin(CachedResponseMixin, RetrieveModelMixin):
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """Runs GET and HEAD requests against the read replica, when one is configured.
+
+    Actions in ``primary_read_actions`` stay on the primary because users expect their own writes there.
+    """
+    primary_read_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if request.method not in SAFE_METHODS or action in self.primary_read_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with use_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ExpandableFieldsMixin:
+    """Passes the comma separated ``fields`` and ``expand`` query params to the serializer context."""
+    default_expand = ()
+
+    def get_default_expand(self):
+        return set(self.default_expand)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_default_expand() | self.get_query_param_set('expand')
+        fields = self.get_query_param_set('fields')
+        if fields:
+            context['fields'] = fields
+        return context
+
+    def get_query_param_set(self, name):
+        value = self.request.query_params.get(name, '') if self.request else ''
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class IdempotentCreateMixin(CreateModelMixin):
+    """Replays the first response to a POST carrying an ``Idempotency-Key`` header instead of running it again.
+
+    Responses are stored per user and key; a concurrent duplicate waits for the first one to finish.
+    """
+
+    def create(self, request, *args, **kwargs):
+        return self.idempotent_response(super().create, request, *args, **kwargs)
+
+    def idempotent_response(self, handler, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error_message': 'Idempotency-Key is longer than {} characters'.format(MAX_KEY_LENGTH)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = idempotency_cache_key(request.user.pk, request.path, key)
+        fingerprint = request_fingerprint(request.method, request.data)
+        stored = stored_response(cache_key)
+        if stored is None:
+            if acquire(cache_key):
+                try:
+                    return self.run_and_store(handler, cache_key, fingerprint, request, *args, **kwargs)
+                finally:
+                    release(cache_key)
+            stored = wait_for_response(cache_key)
+            if stored is None:
+                return Response(
+                    {'error_message': 'A request with this Idempotency-Key is still in progress'},
+                    status=status.HTTP_409_CONFLICT,
                 )
+        return self.replay(stored, fingerprint)
+
+    def run_and_store(self, handler, cache_key, fingerprint, request, *args, **kwargs):
+        try:
+            response = handler(request, *args, **kwargs)
+        except APIException as exc:
+            response = self.handle_exception(exc)
+        if response.status_code < 500:
+            store_response(cache_key, fingerprint, response)
+        return response
 
-                if send_mail:
-                    Reserve.objects.get(pk=key).delete()
+    def replay(self, stored, fingerprint):
+        if stored['fingerprint'] != fingerprint:
+            return Response(
+                {'error_message': 'Idempotency-Key was already used with a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        headers = {'Idempotent-Replayed': 'true'}
+        if stored['location']:
+            headers['Location'] = stored['location']
+        return Response(stored['data'], status=stored['status'], headers=headers)
@@ -1,9 +1,18 @@
+import datetime
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 User = get_user_model()
 
 
+def seance_bounds(date, start_time, duration):
+    starts_at = timezone.make_aware(datetime.datetime.combine(date, start_time))
+    duration = datetime.timedelta(hours=duration.hour, minutes=duration.minute, seconds=duration.second)
+    return starts_at, starts_at + duration
+
+
 class Room(models.Model):
     room_name = models.CharField(max_length=50, null=False, blank=False)
 
@@ -12,9 +21,12 @@ class Room(models.Model):
 
 
 class Seat(models.Model):
+    STANDARD = 'standard'
+
     row = models.IntegerField(null=False, blank=False)
     column = models.IntegerField(null=False, blank=False)
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    category = models.CharField(max_length=20, default=STANDARD)
 
 
 class Film(models.Model):
@@ -24,21 +36,160 @@ class Film(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        duration_changed = self.pk is not None and not Film.objects.filter(pk=self.pk, duration=self.duration).exists()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if duration_changed:
+                self.refresh_seance_ends_at()
+
+    def refresh_seance_ends_at(self):
+        seances = list(self.seance_set.only('id', 'date', 'start_time'))
+        for seance in seances:
+            seance.ends_at = seance_bounds(seance.date, seance.start_time, self.duration)[1]
+        Seance.objects.bulk_update(seances, ['ends_at'], batch_size=500)
+
 
 class Seance(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
     film = models.ForeignKey(Film, on_delete=models.CASCADE)
     date = models.DateField(null=False, auto_now=False, auto_now_add=False)
     start_time = models.TimeField(null=False, auto_now=False, auto_now_add=False)
+    ends_at = models.DateTimeField(null=True, editable=False)
+    capacity = models.PositiveIntegerField(default=0, editable=False)
+    booked_count = models.PositiveIntegerField(default=0, editable=False)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'date', 'start_time', 'ends_at'], name='seance_room_schedule_idx'),
+        ]
+
+    @property
+    def seats_left(self):
+        return max(self.capacity - self.booked_count, 0)
+
+    @property
+    def sold_out(self):
+        return self.capacity > 0 and self.seats_left == 0
+
+    def set_ends_at(self):
+        self.ends_at = seance_bounds(self.date, self.start_time, self.film.duration)[1]
+
+    def save(self, *args, **kwargs):
+        self.set_ends_at()
+        if self.pk is None:
+            self.capacity = Seat.objects.filter(room_id=self.room_id).count()
+        super().save(*args, **kwargs)
+
+
+class PriceTier(models.Model):
+    """Price of one seat category for a film, or for a single seance, which takes precedence."""
+    film = models.ForeignKey(Film, null=True, blank=True, on_delete=models.CASCADE)
+    seance = models.ForeignKey(Seance, null=True, blank=True, on_delete=models.CASCADE)
+    category = models.CharField(max_length=20, default=Seat.STANDARD)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['film', 'category'], name='unique_price_tier_film_category'),
+            models.UniqueConstraint(fields=['seance', 'category'], name='unique_price_tier_seance_category'),
+            models.CheckConstraint(
+                check=models.Q(film__isnull=False) | models.Q(seance__isnull=False), name='price_tier_has_target'
+            ),
+        ]
 
 
 class Booking(models.Model):
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
     seance = models.ForeignKey(Seance, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seance', 'seat'], name='unique_booking_seance_seat'),
+        ]
+        indexes = [
+            models.Index(fields=['seance', 'user'], name='booking_seance_user_idx'),
+            models.Index(fields=['user', 'seance'], name='booking_user_seance_idx'),
+        ]
 
 
 class Reserve(models.Model):
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
     seance = models.ForeignKey(Seance, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seance', 'seat', 'user'], name='unique_reserve_seance_seat_user'),
+        ]
+        indexes = [
+            models.Index(fields=['seance', 'user'], name='reserve_seance_user_idx'),
+        ]
+
+
+class HoldQuerySet(models.QuerySet):
+
+    def active(self):
+        return self.filter(expires_at__gt=timezone.now())
+
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+
+class Hold(models.Model):
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
+    seance = models.ForeignKey(Seance, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = HoldQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seance', 'seat'], name='unique_hold_seance_seat'),
+        ]
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
+class Notification(models.Model):
+    email = models.EmailField()
+    subject = models.CharField(max_length=100)
+    message = models.TextField()
+    reserve = models.ForeignKey(Reserve, null=True, blank=True, on_delete=models.SET_NULL)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claim_token = models.CharField(max_length=32, blank=True, default='', editable=False)
+    claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+
+class ArchivedSeance(models.Model):
+    """A past seance moved out of the hot tables, with its bookings packed into one JSON column.
+
+    ``bookings`` holds ``[seat_id, row, column, category, user_id, price]`` lists, see ``ARCHIVED_BOOKING_FIELDS``.
+    """
+    ARCHIVED_BOOKING_FIELDS = ('seat_id', 'row', 'column', 'category', 'user_id', 'price')
+
+    seance_id = models.IntegerField(primary_key=True)
+    room_id = models.IntegerField()
+    room_name = models.CharField(max_length=50)
+    film_id = models.IntegerField()
+    film_name = models.CharField(max_length=50)
+    date = models.DateField()
+    start_time = models.TimeField()
+    capacity = models.PositiveIntegerField()
+    booked_count = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bookings = models.TextField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'start_time'], name='archived_seance_date_idx'),
+            models.Index(fields=['film_id', 'date'], name='archived_seance_film_idx'),
+        ]
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+
+from django.db.models import Count, F, Sum
+
+from apps.task.models import Seat, Seance, Booking, Hold
+from apps.task.schedule import invalidate_seance_schedule_on_commit
+
+QUERY_CHUNK_SIZE = 500
+
+
+def chunked(items, size=QUERY_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class RoomLayout:
+    """Seats of a room in row-major order; a seat's position indexes every SeatMap of the room."""
+
+    def __init__(self, seats):
+        self.seat_ids = []
+        self.rows = []
+        self.columns = []
+        self.first_columns = {}
+        for seat_id, row, column in seats:
+            self.seat_ids.append(seat_id)
+            self.rows.append(row)
+            self.columns.append(column)
+            self.first_columns[row] = min(column, self.first_columns.get(row, column))
+        self.index = {seat_id: position for position, seat_id in enumerate(self.seat_ids)}
+
+    def __len__(self):
+        return len(self.seat_ids)
+
+
+class SeatMap:
+    """Occupancy of one seance, booked or actively held: one byte per seat of the room layout."""
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.occupied = bytearray(len(layout))
+
+    def mark(self, seat_id):
+        position = self.layout.index.get(seat_id)
+        if position is not None:
+            self.occupied[position] = 1
+
+    def is_occupied(self, seat_id):
+        position = self.layout.index.get(seat_id)
+        return position is not None and bool(self.occupied[position])
+
+    def chairs(self):
+        return OrderedDict(zip(self.layout.seat_ids, map(bool, self.occupied)))
+
+
+def load_room_layouts(room_ids):
+    seats = {room_id: [] for room_id in room_ids}
+    for room_ids_chunk in chunked(seats):
+        rows = Seat.objects.filter(room_id__in=room_ids_chunk).order_by(
+            'room_id', 'row', 'column', 'id'
+        ).values_list('room_id', 'id', 'row', 'column')
+        for room_id, seat_id, row, column in rows:
+            seats[room_id].append((seat_id, row, column))
+
+    return {room_id: RoomLayout(room_seats) for room_id, room_seats in seats.items()}
+
+
+def build_seat_maps(seances, layouts=None):
+    """Seat maps of ``seances`` keyed by seance id; rooms missing from ``layouts`` are loaded and added to it."""
+    seances = list(seances)
+    layouts = {} if layouts is None else layouts
+    layouts.update(load_room_layouts({seance.room_id for seance in seances} - set(layouts)))
+    seat_maps = {seance.id: SeatMap(layouts[seance.room_id]) for seance in seances}
+
+    for seance_ids_chunk in chunked(seat_maps):
+        booked = Booking.objects.filter(seance_id__in=seance_ids_chunk).values_list('seance_id', 'seat_id')
+        held = Hold.objects.active().filter(seance_id__in=seance_ids_chunk).values_list('seance_id', 'seat_id')
+        occupied = booked.union(held, all=True)
+        for seance_id, seat_id in occupied:
+            seat_maps[seance_id].mark(seat_id)
+
+    return seat_maps
+
+
+class SeanceSnapshot:
+    """Seances, room layouts and seat maps of one request, loaded in bulk and shared by every serialized row.
+
+    ``add`` loads whatever the snapshot is missing in one pass, so a page costs the same queries however many rows,
+    and a seance nested under several rows is rendered once.
+    """
+
+    def __init__(self, chairs=False):
+        self.chairs = chairs
+        self.layouts = {}
+        self.seat_maps = {}
+        self.rendered = {}
+
+    def add(self, seances):
+        missing = {seance.id: seance for seance in seances if seance.id not in self.seat_maps}
+        if self.chairs and missing:
+            self.seat_maps.update(build_seat_maps(missing.values(), self.layouts))
+
+    def seat_map(self, seance):
+        if seance.id not in self.seat_maps:
+            self.seat_maps.update(build_seat_maps([seance], self.layouts))
+        return self.seat_maps[seance.id]
+
+    def render(self, seance, serializer):
+        if seance.id not in self.rendered:
+            self.rendered[seance.id] = serializer.to_representation(seance)
+        return self.rendered[seance.id]
+
+
+def adjust_booked_count(seance_id, delta, revenue=0):
+    Seance.objects.filter(pk=seance_id).update(
+        booked_count=F('booked_count') + delta, revenue=F('revenue') + revenue
+    )
+    invalidate_seance_schedule_on_commit(seance_id)
+
+
+def room_capacities(room_ids):
+    return dict(Seat.objects.filter(room_id__in=room_ids).values_list('room_id').annotate(Count('id')).order_by())
+
+
+def recount_occupancy(seances):
+    """Recompute capacity, booked_count and revenue of the given seances, returning those whose counters drifted."""
+    seances = list(seances)
+    capacities = room_capacities({seance.room_id for seance in seances})
+    booked = {
+        seance_id: (count, revenue)
+        for seance_id, count, revenue in Booking.objects.filter(
+            seance_id__in=[seance.id for seance in seances]
+        ).values_list('seance_id').annotate(Count('id'), Sum('price')).order_by()
+    }
+
+    drifted = []
+    for seance in seances:
+        capacity = capacities.get(seance.room_id, 0)
+        booked_count, revenue = booked.get(seance.id, (0, 0))
+        if (seance.capacity, seance.booked_count, seance.revenue) != (capacity, booked_count, revenue):
+            seance.capacity, seance.booked_count, seance.revenue = capacity, booked_count, revenue
+            drifted.append(seance)
+    return drifted
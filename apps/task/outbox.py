@@ -0,0 +1,78 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.task.models import Notification, Reserve
+
+SEAT_RELEASED_SUBJECT = 'Cinema Booking'
+SEAT_RELEASED_MESSAGE = 'You can booking your reserve seat'
+
+
+def enqueue_seat_released(seance_id, seat_id):
+    reserved_users = Reserve.objects.filter(seance_id=seance_id, seat_id=seat_id).values_list('id', 'user__email')
+    Notification.objects.bulk_create([
+        Notification(email=email, subject=SEAT_RELEASED_SUBJECT, message=SEAT_RELEASED_MESSAGE, reserve_id=reserve_id)
+        for reserve_id, email in reserved_users
+    ])
+
+
+def claimable(max_attempts):
+    stale = timezone.now() - timedelta(seconds=settings.NOTIFICATION_CLAIM_SECONDS)
+    return Notification.objects.filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale), attempts__lt=max_attempts)
+
+
+def claim_batch(batch_size, max_attempts):
+    """Mark up to ``batch_size`` pending notifications as in flight for this drainer and return them.
+
+    The claim is a single short UPDATE, so no lock is held while mail is sent and no SKIP LOCKED is needed; a
+    claim left by a crashed drainer is taken over after NOTIFICATION_CLAIM_SECONDS.
+    """
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(claimable(max_attempts).order_by('id').values_list('id', flat=True)[:batch_size])
+        claimable(max_attempts).filter(id__in=ids).update(claim_token=token, claimed_at=timezone.now())
+    return list(Notification.objects.filter(claim_token=token).order_by('id'))
+
+
+def drain_outbox(batch_size=100, max_attempts=5):
+    """Send one batch of pending notifications over a single mail connection.
+
+    Sent notifications and the reserves they answer are deleted; failed ones keep their row with one more
+    attempt recorded and are retried by the next batch until max_attempts is reached.
+    """
+    pending = claim_batch(batch_size, max_attempts)
+    if not pending:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for notification in pending:
+            message = EmailMessage(
+                notification.subject, notification.message, to=[notification.email], connection=connection
+            )
+            try:
+                connection.send_messages([message])
+            except Exception:
+                failed.append(notification.id)
+            else:
+                sent.append(notification)
+    except Exception:
+        failed = [notification.id for notification in pending if notification not in sent]
+    finally:
+        connection.close()
+
+    with transaction.atomic():
+        Notification.objects.filter(id__in=[notification.id for notification in sent]).delete()
+        Reserve.objects.filter(id__in=[notification.reserve_id for notification in sent]).delete()
+        Notification.objects.filter(id__in=failed).update(
+            attempts=F('attempts') + 1, claim_token='', claimed_at=None
+        )
+
+    return len(sent), len(failed)
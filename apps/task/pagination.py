@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CinemaCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class BookingCursorPagination(CinemaCursorPagination):
+    ordering = '-id'
+
+
+class UpcomingBookingCursorPagination(CinemaCursorPagination):
+    ordering = ('seance_date', 'seance_start_time', 'id')
+
+
+class PastBookingCursorPagination(CinemaCursorPagination):
+    ordering = ('-seance_date', '-seance_start_time', '-id')
+
+
+class SeanceCursorPagination(CinemaCursorPagination):
+    ordering = ('date', 'start_time', 'id')
+
+
+class ArchivedSeanceCursorPagination(CinemaCursorPagination):
+    ordering = ('-date', '-start_time', '-seance_id')
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from apps.task.models import PriceTier, Seat
+
+
+def room_categories_key(room_id):
+    return 'room-categories:{}'.format(room_id)
+
+
+def room_categories(room_id, seat_ids=()):
+    """``{seat_id: category}`` of a room, cached for ROOM_CATEGORIES_CACHE_TIMEOUT seconds.
+
+    Seat changes delete the entry on commit; the timeout bounds how long a worker that missed the deletion keeps
+    charging an old category. Reloaded when any of ``seat_ids`` is missing, so a new seat is never mispriced.
+    """
+    key = room_categories_key(room_id)
+    categories = cache.get(key)
+    if categories is None or any(seat_id not in categories for seat_id in seat_ids):
+        categories = dict(Seat.objects.filter(room_id=room_id).values_list('id', 'category'))
+        cache.set(key, categories, settings.ROOM_CATEGORIES_CACHE_TIMEOUT)
+    return categories
+
+
+def invalidate_room_categories_on_commit(room_id):
+    transaction.on_commit(lambda: cache.delete(room_categories_key(room_id)))
+
+
+def price_list(seance):
+    """``{category: price}`` for a seance from one query: defaults, then the film's tiers, then the seance's own."""
+    prices = {category: Decimal(price) for category, price in settings.DEFAULT_SEAT_PRICES.items()}
+    tiers = PriceTier.objects.filter(
+        Q(seance_id=seance.id) | Q(film_id=seance.film_id, seance__isnull=True)
+    ).values_list('seance_id', 'category', 'price')
+    for _, category, price in sorted(tiers, key=lambda tier: tier[0] is not None):
+        prices[category] = price
+    return prices
+
+
+def price_seats(seance, seat_ids):
+    """``{seat_id: (category, price)}`` for seats of the seance room; seats outside the room are left out."""
+    categories = room_categories(seance.room_id, seat_ids)
+    prices = price_list(seance)
+    fallback = prices.get(Seat.STANDARD, Decimal(0))
+    return {
+        seat_id: (categories[seat_id], prices.get(categories[seat_id], fallback))
+        for seat_id in seat_ids if seat_id in categories
+    }
@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.utils import timezone
+
+from apps.task.caching import bump_catalogue_version_on_commit
+from apps.task.exceptions import LayoutError
+from apps.task.models import Room, Seat, Seance, Booking
+from apps.task.occupancy import chunked
+from apps.task.pricing import invalidate_room_categories_on_commit
+from apps.task.schedule import bump_schedule_generation_on_commit
+
+GAPS = frozenset('. ')
+DEFAULT_CATEGORIES = {'S': Seat.STANDARD}
+BATCH_SIZE = 500
+
+
+def parse_layout(rows, categories=None):
+    """Map a list of row strings to {(row, column): category}.
+
+    Every character is one position; ``.`` and spaces are gaps that still take a column number, so seat
+    columns keep their physical position. Other characters are category codes looked up in ``categories``.
+    """
+    categories = categories or DEFAULT_CATEGORIES
+    layout = {}
+    for row_number, row in enumerate(rows, start=1):
+        for column_number, code in enumerate(row, start=1):
+            if code in GAPS:
+                continue
+            if code not in categories:
+                raise LayoutError('Unknown seat code {!r} in row {}'.format(code, row_number))
+            layout[(row_number, column_number)] = categories[code]
+
+    if not layout:
+        raise LayoutError('A room needs at least one seat')
+    return layout
+
+
+def provision_room(room_name, rows, categories=None):
+    """Create the room if needed and bring its seats in line with the layout with bulk queries only."""
+    layout = parse_layout(rows, categories)
+
+    with transaction.atomic():
+        room = Room.objects.filter(room_name=room_name).first() or Room.objects.create(room_name=room_name)
+        existing = {
+            (row, column): (seat_id, category)
+            for seat_id, row, column, category in Seat.objects.filter(room=room).values_list(
+                'id', 'row', 'column', 'category'
+            )
+        }
+
+        removed = [seat_id for position, (seat_id, _) in existing.items() if position not in layout]
+        if removed and Booking.objects.filter(seat_id__in=removed).exists():
+            raise LayoutError('Cannot remove booked seats from {}'.format(room_name))
+        for seat_ids in chunked(removed, BATCH_SIZE):
+            Seat.objects.filter(id__in=seat_ids).delete()
+
+        created = [
+            Seat(room=room, row=row, column=column, category=category)
+            for (row, column), category in layout.items() if (row, column) not in existing
+        ]
+        Seat.objects.bulk_create(created, batch_size=BATCH_SIZE)
+
+        updated = [
+            Seat(id=existing[position][0], category=category)
+            for position, category in layout.items()
+            if position in existing and existing[position][1] != category
+        ]
+        Seat.objects.bulk_update(updated, ['category'], batch_size=BATCH_SIZE)
+
+        if created or removed:
+            Seance.objects.filter(room=room, date__gte=timezone.localdate()).update(capacity=len(layout))
+        if created or removed or updated:
+            bump_catalogue_version_on_commit()
+            bump_schedule_generation_on_commit()
+            invalidate_room_categories_on_commit(room.id)
+
+    return room, {'created': len(created), 'updated': len(updated), 'deleted': len(removed)}
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.renderers import BaseRenderer
+
+BOOKED = 'booked'
+HELD = 'held'
+RELEASED = 'released'
+
+
+class SeatChannel:
+
+    def __init__(self, backlog, version):
+        self.version = version
+        self.events = deque(maxlen=backlog)
+
+
+class SeatEventHub:
+    """In-process fan-out of seat state deltas per seance.
+
+    Every delta gets the next version number of its seance; the last ``backlog`` deltas are kept so a
+    reconnecting client can be sent exactly what it missed. A client whose version fell out of the backlog
+    (or comes from another process) gets ``None`` and should be sent a full snapshot. Only the
+    ``max_channels`` most recently published seances are kept.
+
+    Deltas only reach streams served by the process that committed them: seats booked through another
+    worker, or holds released by ``sweep_holds``, are not pushed, and those clients only catch up at their
+    next snapshot. Serve the event streams from a single process where every delta has to be pushed.
+    """
+
+    def __init__(self, backlog, max_channels):
+        self.backlog = backlog
+        self.max_channels = max_channels
+        self.condition = threading.Condition()
+        self.channels = OrderedDict()
+        # New channels start past every version handed out before, so a channel recreated after pruning (or
+        # a restarted process) never reuses the versions of the one it replaced
+        self.last_version = int(time.time() * 1000)
+
+    def publish(self, seance_id, changes):
+        with self.condition:
+            channel = self.channels.get(seance_id)
+            if channel is None:
+                channel = self.channels[seance_id] = SeatChannel(self.backlog, self.last_version)
+                while len(self.channels) > self.max_channels:
+                    self.channels.popitem(last=False)
+            else:
+                self.channels.move_to_end(seance_id)
+            for seat_id, state in changes:
+                channel.version += 1
+                channel.events.append((channel.version, {'seat': seat_id, 'state': state}))
+            self.last_version = max(self.last_version, channel.version)
+            self.condition.notify_all()
+
+    def version(self, seance_id):
+        with self.condition:
+            return self.current_version(seance_id)
+
+    def current_version(self, seance_id):
+        channel = self.channels.get(seance_id)
+        return channel.version if channel else 0
+
+    def changes_since(self, seance_id, since):
+        channel = self.channels.get(seance_id)
+        if channel is None:
+            return 0, [] if since == 0 else None
+        if since > channel.version:
+            return channel.version, None
+
+        oldest = channel.events[0][0] if channel.events else channel.version + 1
+        if since < oldest - 1:
+            return channel.version, None
+        return channel.version, [change for version, change in channel.events if version > since]
+
+    def wait(self, seance_id, since, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.current_version(seance_id) != since, timeout)
+            return self.changes_since(seance_id, since)
+
+
+hub = SeatEventHub(settings.SEAT_EVENTS_BACKLOG, settings.SEAT_EVENTS_CHANNELS)
+
+
+def publish_on_commit(seance_id, changes):
+    transaction.on_commit(lambda: hub.publish(seance_id, changes))
+
+
+def sse_message(event, version, data):
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(version, event, json.dumps(data))
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Only error responses are rendered here, as an ``error`` event; the stream itself bypasses renderers."""
+        if data is None:
+            return b''
+        return 'event: error\ndata: {}\n\n'.format(json.dumps(data)).encode()
@@ -0,0 +1,58 @@
+import heapq
+
+
+def free_row_masks(seat_map):
+    """``{row: (first_column, mask)}`` with bit ``column - first_column`` set for every free seat of the row.
+
+    Offsetting by the row's own first column keeps the shifts non-negative whatever the columns are numbered from.
+    """
+    layout = seat_map.layout
+    first_columns = layout.first_columns
+    masks = {}
+    for row, column, occupied in zip(layout.rows, layout.columns, seat_map.occupied):
+        if not occupied:
+            masks[row] = masks.get(row, 0) | 1 << (column - first_columns[row])
+    return {row: (first_columns[row], mask) for row, mask in masks.items()}
+
+
+def recommend_blocks(seat_map, seats, limit=5):
+    """Top ``limit`` runs of ``seats`` adjacent free seats, the most central first.
+
+    Runs are found a whole row at a time: ``mask & mask >> 1 & ... & mask >> (seats - 1)`` leaves a bit set at
+    every column where such a run starts. Gaps in the layout are missing bits, so runs never cross an aisle.
+    """
+    layout = seat_map.layout
+    if not len(layout) or seats < 1:
+        return []
+
+    first_row, last_row = min(layout.rows), max(layout.rows)
+    first_column, last_column = min(layout.columns), max(layout.columns)
+    center_row = (first_row + last_row) / 2
+    center_column = (first_column + last_column) / 2
+    height = max(last_row - first_row, 1)
+    width = max(last_column - first_column, 1)
+
+    candidates = []
+    for row, (first_column, mask) in free_row_masks(seat_map).items():
+        starts = mask
+        for shift in range(1, seats):
+            starts &= mask >> shift
+        row_distance = abs(row - center_row) / height
+        while starts:
+            lowest = starts & -starts
+            column = lowest.bit_length() - 1 + first_column
+            block_center = column + (seats - 1) / 2
+            score = abs(block_center - center_column) / width + row_distance
+            candidates.append((score, row, column))
+            starts ^= lowest
+
+    seat_ids = dict(zip(zip(layout.rows, layout.columns), layout.seat_ids))
+    return [
+        {
+            'row': row,
+            'columns': list(range(column, column + seats)),
+            'seats': [seat_ids[(row, block_column)] for block_column in range(column, column + seats)],
+            'score': round(score, 4),
+        }
+        for score, row, column in heapq.nsmallest(limit, candidates)
+    ]
@@ -0,0 +1,132 @@
+import csv
+import datetime
+import json
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+
+from apps.task.models import Booking, Seance
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV = 'csv'
+JSON_LINES = 'jsonl'
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    JSON_LINES: 'application/x-ndjson; charset=utf-8',
+}
+
+BOOKING_FIELDS = (
+    ('booking_id', 'id'),
+    ('date', 'seance__date'),
+    ('start_time', 'seance__start_time'),
+    ('seance_id', 'seance_id'),
+    ('film_id', 'seance__film_id'),
+    ('film_name', 'seance__film__name'),
+    ('room_id', 'seance__room_id'),
+    ('room_name', 'seance__room__room_name'),
+    ('row', 'seat__row'),
+    ('column', 'seat__column'),
+    ('category', 'seat__category'),
+    ('price', 'price'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+)
+
+
+def seance_filter(prefix='', date_from=None, date_to=None, film_id=None, room_id=None):
+    condition = Q()
+    if date_from:
+        condition &= Q(**{prefix + 'date__gte': date_from})
+    if date_to:
+        condition &= Q(**{prefix + 'date__lte': date_to})
+    if film_id:
+        condition &= Q(**{prefix + 'film_id': film_id})
+    if room_id:
+        condition &= Q(**{prefix + 'room_id': room_id})
+    return condition
+
+
+def booking_rows(**filters):
+    """Keyset-paginated so neither the client library nor the database holds more than one chunk at a time."""
+    lookups = {name: F(lookup) for name, lookup in BOOKING_FIELDS if name != lookup}
+    names = [name for name, _ in BOOKING_FIELDS]
+    queryset = (
+        Booking.objects.filter(seance_filter('seance__', **filters))
+        .order_by('id')
+        .values(*[name for name in names if name not in lookups], **lookups)
+    )
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:EXPORT_CHUNK_SIZE])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1]['booking_id']
+
+
+def seance_occupancy_rows(**filters):
+    return (
+        Seance.objects.filter(seance_filter(**filters))
+        .order_by('date', 'start_time', 'id')
+        .values(
+            'id', 'date', 'start_time', 'capacity', 'revenue', film_name=F('film__name'), room_name=F('room__room_name')
+        )
+        .annotate(booked=Count('booking'))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def film_total_rows(**filters):
+    return (
+        Booking.objects.filter(seance_filter('seance__', **filters))
+        .values(film_id=F('seance__film_id'), film_name=F('seance__film__name'))
+        .annotate(
+            bookings=Count('id'), revenue=Sum('price'), seances=Count('seance', distinct=True),
+            customers=Count('user', distinct=True),
+        )
+        .order_by('film_id')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+REPORTS = {
+    'bookings': (booking_rows, [name for name, _ in BOOKING_FIELDS]),
+    'occupancy': (
+        seance_occupancy_rows, ['id', 'date', 'start_time', 'film_name', 'room_name', 'capacity', 'booked', 'revenue']
+    ),
+    'films': (film_total_rows, ['film_id', 'film_name', 'bookings', 'revenue', 'seances', 'customers']),
+}
+
+
+class Echo:
+    """File-like object whose write() hands the formatted line back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields):
+    writer = csv.DictWriter(Echo(), fieldnames=fields, extrasaction='ignore')
+    yield writer.writerow(dict(zip(fields, fields)))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def json_lines(rows, fields):
+    for row in rows:
+        yield json.dumps({field: row[field] for field in fields}, default=encode_value) + '\n'
+
+
+def export_lines(report, export_format, **filters):
+    rows, fields = REPORTS[report]
+    encode = csv_lines if export_format == CSV else json_lines
+    return encode(rows(**filters), fields)
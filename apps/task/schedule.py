@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.task.caching import bump_generation, get_generation
+from apps.task.models import Seance
+
+SCHEDULE_GENERATION_KEY = 'schedule:generation'
+
+
+def get_schedule_generation():
+    return get_generation(SCHEDULE_GENERATION_KEY)
+
+
+def bump_schedule_generation():
+    """Drop every materialized date at once, for film edits, planning, provisioning and counter repairs."""
+    bump_generation(SCHEDULE_GENERATION_KEY)
+
+
+def bump_schedule_generation_on_commit():
+    transaction.on_commit(bump_schedule_generation)
+
+
+def schedule_cache_key(date):
+    return 'schedule:{}:{}'.format(get_schedule_generation(), date.isoformat())
+
+
+def invalidate_schedule(date):
+    cache.delete(schedule_cache_key(date))
+
+
+def invalidate_seance_schedule_on_commit(seance_id):
+    def invalidate():
+        date = Seance.objects.filter(pk=seance_id).values_list('date', flat=True).first()
+        if date is not None:
+            invalidate_schedule(date)
+
+    transaction.on_commit(invalidate)
+
+
+def build_schedule(date):
+    """Films showing on ``date`` with their seances and seats left, from one query over the occupancy counters."""
+    seances = Seance.objects.filter(date=date).order_by('film__name', 'film_id', 'start_time', 'room_id').values_list(
+        'id', 'start_time', 'room_id', 'room__room_name', 'capacity', 'booked_count',
+        'film_id', 'film__name', 'film__duration',
+    )
+    films = OrderedDict()
+    for seance_id, start_time, room_id, room_name, capacity, booked_count, film_id, film_name, duration in seances:
+        if film_id not in films:
+            films[film_id] = {'id': film_id, 'name': film_name, 'duration': duration.isoformat(), 'seances': []}
+        seats_left = max(capacity - booked_count, 0)
+        films[film_id]['seances'].append({
+            'id': seance_id,
+            'start_time': start_time.isoformat(),
+            'room': room_id,
+            'room_name': room_name,
+            'capacity': capacity,
+            'seats_left': seats_left,
+            'sold_out': capacity > 0 and seats_left == 0,
+        })
+    return {'date': date.isoformat(), 'films': list(films.values())}
+
+
+def get_schedule(date):
+    cache_key = schedule_cache_key(date)
+    schedule = cache.get(cache_key)
+    if schedule is None:
+        schedule = build_schedule(date)
+        cache.set(cache_key, schedule, settings.SCHEDULE_CACHE_TIMEOUT)
+    return schedule
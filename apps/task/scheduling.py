@@ -0,0 +1,96 @@
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.task.models import Seance, seance_bounds
+
+MAX_PARALLEL_SEANCES = 2
+PLAN_BATCH_SIZE = 200
+
+ROOM_BUSY_MESSAGE = 'Cannot save have already seance in that time'
+TOO_MANY_PARALLEL_MESSAGE = 'Cannot be seance in 3 rooms at the same time'
+
+
+def overlapping_seances(starts_at, ends_at):
+    """Seances whose [start, end) interval intersects the given one, including runs past midnight."""
+    local_start = timezone.localtime(starts_at)
+    local_end = timezone.localtime(ends_at)
+    return Seance.objects.filter(
+        Q(date__lt=local_end.date()) | Q(date=local_end.date(), start_time__lt=local_end.time()),
+        date__gte=local_start.date() - datetime.timedelta(days=1),
+        ends_at__gt=starts_at,
+    )
+
+
+def stored_intervals(seances):
+    for date, start_time, ends_at, room_id in seances.values_list('date', 'start_time', 'ends_at', 'room_id'):
+        yield timezone.make_aware(datetime.datetime.combine(date, start_time)), ends_at, room_id, None
+
+
+def schedule_conflict(room_id, starts_at, ends_at, exclude_pk=None):
+    overlapping = overlapping_seances(starts_at, ends_at).exclude(pk=exclude_pk)
+    if overlapping.filter(room_id=room_id).exists():
+        return ROOM_BUSY_MESSAGE
+    intervals = list(stored_intervals(overlapping)) + [(starts_at, ends_at, room_id, 0)]
+    return parallel_errors(intervals).get(0)
+
+
+def parallel_errors(intervals):
+    """Sweep ``(starts_at, ends_at, room_id, index)`` intervals in time order and blame the unsaved ones (those
+    with an index) that would make more than MAX_PARALLEL_SEANCES run at the same moment.
+
+    Ends sort before starts at the same instant, so back-to-back seances never count as parallel.
+    """
+    events = []
+    for position, (starts_at, ends_at, room_id, index) in enumerate(intervals):
+        events.append((starts_at, 1, position))
+        events.append((ends_at, -1, position))
+
+    errors = {}
+    running = set()
+    for _, change, position in sorted(events):
+        if change < 0:
+            running.discard(position)
+            continue
+        if len(running) >= MAX_PARALLEL_SEANCES:
+            index = intervals[position][3]
+            if index is not None:
+                errors.setdefault(index, TOO_MANY_PARALLEL_MESSAGE)
+                continue
+            for blamed in running:
+                if intervals[blamed][3] is not None:
+                    errors.setdefault(intervals[blamed][3], TOO_MANY_PARALLEL_MESSAGE)
+        running.add(position)
+    return errors
+
+
+def plan_seances(seances):
+    """Validate unsaved seances against each other and the stored schedule with a sort-and-sweep.
+
+    Sets ``ends_at`` on every seance and returns a dict of error messages keyed by the index of the
+    offending seance; an empty dict means the whole plan can be inserted.
+    """
+    intervals = []
+    for index, seance in enumerate(seances):
+        starts_at, seance.ends_at = seance_bounds(seance.date, seance.start_time, seance.film.duration)
+        intervals.append((starts_at, seance.ends_at, seance.room_id, index))
+
+    first_start = min(interval[0] for interval in intervals)
+    last_end = max(interval[1] for interval in intervals)
+    intervals.extend(stored_intervals(overlapping_seances(first_start, last_end)))
+
+    errors = {}
+    latest_by_room = {}
+    for starts_at, ends_at, room_id, index in sorted(intervals, key=lambda interval: interval[0]):
+        latest = latest_by_room.get(room_id)
+        if latest is not None and latest[0] > starts_at:
+            for blamed in (latest[1], index):
+                if blamed is not None:
+                    errors[blamed] = ROOM_BUSY_MESSAGE
+        if latest is None or ends_at > latest[0]:
+            latest_by_room[room_id] = (ends_at, index)
+
+    for index, error in parallel_errors(intervals).items():
+        errors.setdefault(index, error)
+    return errors
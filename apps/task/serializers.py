@@ -1,12 +1,25 @@
-from collections import OrderedDict
-
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueValidator
 
-from apps.task.models import Room, Film, Seance, Booking, Reserve, Seat
+from apps.task.archiving import unpack_bookings
+from apps.task.booking import (
+    MAX_BULK_SEATS, book_seat, book_seats, check_not_held_by_others, hold_seat, seat_conflict_guard,
+)
+from apps.task.caching import bump_catalogue_version_on_commit
+from apps.task.models import Room, Film, Seance, Booking, Reserve, Seat, Hold, ArchivedSeance
+from apps.task.exceptions import LayoutError
+from apps.task.occupancy import SeanceSnapshot, adjust_booked_count, room_capacities
+from apps.task.pricing import price_seats
+from apps.task.provisioning import parse_layout, provision_room
+from apps.task.realtime import RELEASED, publish_on_commit
+from apps.task.reports import CSV, JSON_LINES
+from apps.task.schedule import bump_schedule_generation_on_commit
+from apps.task.scheduling import PLAN_BATCH_SIZE, plan_seances
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -25,6 +38,18 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'password', 'email')
 
 
+class UserImportSerializer(UserSerializer):
+    """UserSerializer's field rules without its per-row uniqueness queries; import_users checks those in bulk."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field_name in ('username', 'email'):
+            fields[field_name].validators = [
+                validator for validator in fields[field_name].validators if not isinstance(validator, UniqueValidator)
+            ]
+        return fields
+
+
 class RoomSerializer(serializers.ModelSerializer):
     room_name = serializers.CharField(required=True, allow_blank=False, allow_null=False, max_length=30, min_length=2)
 
@@ -33,13 +58,42 @@ class RoomSerializer(serializers.ModelSerializer):
         fields = ('room_name', )
 
 
+class RoomLayoutSerializer(serializers.Serializer):
+    room_name = serializers.CharField(required=True, allow_blank=False, max_length=30, min_length=2)
+    rows = serializers.ListField(child=serializers.CharField(trim_whitespace=False), min_length=1)
+    categories = serializers.DictField(child=serializers.CharField(max_length=20), required=False)
+
+    def validate(self, attrs):
+        if any(len(code) != 1 for code in attrs.get('categories', {})):
+            raise ValidationError({'categories': 'Category codes must be single characters'})
+        try:
+            parse_layout(attrs['rows'], attrs.get('categories'))
+        except LayoutError as error:
+            raise ValidationError({'rows': str(error)})
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            room, stats = provision_room(validated_data['room_name'], validated_data['rows'],
+                                         validated_data.get('categories'))
+        except LayoutError as error:
+            raise ValidationError({'error_message': str(error)})
+        return dict(stats, room=room)
+
+    def to_representation(self, instance):
+        return {
+            'id': instance['room'].id, 'room_name': instance['room'].room_name,
+            'created': instance['created'], 'updated': instance['updated'], 'deleted': instance['deleted'],
+        }
+
+
 class SeatSerializer(serializers.ModelSerializer):
     row = serializers.IntegerField(required=True, allow_null=False)
     column = serializers.IntegerField(required=True, allow_null=False)
 
     class Meta:
         model = Seat
-        fields = ('row', 'column', 'room', )
+        fields = ('row', 'column', 'room', 'category', )
 
 
 class FilmSerializer(serializers.ModelSerializer):
@@ -51,51 +105,278 @@ class FilmSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'duration')
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class ExpandableSerializerMixin:
+    """Renders only the fields named in context['fields'] and the nested parts named in context['expand'].
+
+    ``fields`` trims the output only; writes always validate and save every field sent.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields:
+            unknown = fields - set(self.fields)
+            if unknown:
+                raise ValidationError({'error_message': 'Unknown fields {}, valid fields are {}'.format(
+                    ', '.join(sorted(unknown)), ', '.join(self.fields)
+                )})
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response['seance'] = SeanceSerializer(instance.seance).data
+        fields = self.context.get('fields')
+        if fields:
+            for field_name in set(response) - fields:
+                del response[field_name]
+        return response
+
+    @property
+    def expand(self):
+        return self.context.get('expand', frozenset())
+
+
+class SnapshotListSerializer(serializers.ListSerializer):
+    """Adds the seances of every row to the shared ``SeanceSnapshot`` before rendering any of them."""
+
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.snapshot.add(self.child.snapshot_seances(instances))
+        return super().to_representation(instances)
+
+
+class SnapshotSerializerMixin:
+    """Renders seances from the ``SeanceSnapshot`` in context['snapshot'], creating it on first use."""
+
+    @property
+    def snapshot(self):
+        if 'snapshot' not in self.context:
+            self.context['snapshot'] = SeanceSnapshot(chairs='chairs' in self.expand)
+        return self.context['snapshot']
+
+    def snapshot_seances(self, instances):
+        """The seances rendered for ``instances``; the rows themselves by default."""
+        return instances
+
+
+class BookingSerializer(SnapshotSerializerMixin, ExpandableSerializerMixin, serializers.ModelSerializer):
+
+    @cached_property
+    def seance_serializer(self):
+        return SeanceSerializer(context={'expand': self.expand, 'snapshot': self.snapshot})
+
+    def snapshot_seances(self, instances):
+        if 'seance' not in self.expand:
+            return []
+        return [booking.seance for booking in instances]
+
+    def to_representation(self, instance):
+        response = super().to_representation(instance)
+        if 'seance' in response and 'seance' in self.expand:
+            response['seance'] = self.snapshot.render(instance.seance, self.seance_serializer)
         return response
 
     def validate(self, attrs):
-        if not self.partial:
-            exists_booking = Booking.objects.filter(**attrs).first()
-            if exists_booking:
-                raise ValidationError({'error_message': 'Have already booked that seat'})
+        seat = attrs.get('seat', getattr(self.instance, 'seat', None))
+        seance = attrs.get('seance', getattr(self.instance, 'seance', None))
+        if seat and seance and seat.room_id != seance.room_id:
+            raise ValidationError({'error_message': 'That seat is not in the seance room'})
 
         attrs['user'] = self.context['request'].user
         return attrs
 
     def create(self, validated_data):
-        instance, _ = Booking.objects.get_or_create(**validated_data)
+        return book_seat(**validated_data)
+
+    def update(self, instance, validated_data):
+        previous = (instance.seance_id, instance.seat_id)
+        previous_price = instance.price
+        seance = validated_data.get('seance', instance.seance)
+        seat = validated_data.get('seat', instance.seat)
+        if previous != (seance.id, seat.id):
+            validated_data['price'] = price_seats(seance, [seat.id])[seat.id][1]
+
+        with seat_conflict_guard():
+            if previous != (seance.id, seat.id):
+                check_not_held_by_others(instance.user, seance, [seat.id])
+                Hold.objects.filter(seance=seance, seat=seat).delete()
+            instance = super().update(instance, validated_data)
+            if previous != (instance.seance_id, instance.seat_id):
+                publish_on_commit(previous[0], [(previous[1], RELEASED)])
+            if previous[0] != instance.seance_id:
+                adjust_booked_count(previous[0], -1, -previous_price)
+                adjust_booked_count(instance.seance_id, 1, instance.price)
+            elif previous_price != instance.price:
+                adjust_booked_count(instance.seance_id, 0, instance.price - previous_price)
         return instance
 
     class Meta:
         model = Booking
-        fields = ('id', 'seat', 'seance', )
+        fields = ('id', 'seat', 'seance', 'price', )
+        list_serializer_class = SnapshotListSerializer
+
+
+class MyBookingSerializer(serializers.ModelSerializer):
+    """Flat row of the owner's booking history, filled from one select_related query without seat maps."""
+    row = serializers.ReadOnlyField(source='seat.row')
+    column = serializers.ReadOnlyField(source='seat.column')
+    category = serializers.ReadOnlyField(source='seat.category')
+    date = serializers.DateField(source='seance.date', read_only=True)
+    start_time = serializers.TimeField(source='seance.start_time', read_only=True)
+    film = serializers.ReadOnlyField(source='seance.film_id')
+    film_name = serializers.ReadOnlyField(source='seance.film.name')
+    room = serializers.ReadOnlyField(source='seance.room_id')
+    room_name = serializers.ReadOnlyField(source='seance.room.room_name')
+
+    class Meta:
+        model = Booking
+        fields = (
+            'id', 'seance', 'seat', 'row', 'column', 'category', 'price', 'date', 'start_time', 'film', 'film_name',
+            'room', 'room_name',
+        )
+        read_only_fields = fields
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    seance = serializers.PrimaryKeyRelatedField(queryset=Seance.objects.all())
+    seats = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=MAX_BULK_SEATS)
+
+    def validate(self, attrs):
+        seat_ids = attrs['seats']
+        if len(set(seat_ids)) != len(seat_ids):
+            raise ValidationError({'error_message': 'Seats must not repeat'})
+
+        room_seats = Seat.objects.filter(pk__in=seat_ids, room_id=attrs['seance'].room_id).count()
+        if room_seats != len(seat_ids):
+            raise ValidationError({'error_message': 'All seats must exist in the seance room'})
+
+        attrs['user'] = self.context['request'].user
+        return attrs
+
+    def create(self, validated_data):
+        bookings = book_seats(validated_data['user'], validated_data['seance'], validated_data['seats'])
+        return dict(validated_data, total=sum(booking.price for booking in bookings))
+
+    def to_representation(self, instance):
+        return {'seance': instance['seance'].id, 'seats': instance['seats'], 'total': str(instance['total'])}
 
 
-class SeanceSerializer(serializers.ModelSerializer):
+class SeanceSerializer(SnapshotSerializerMixin, ExpandableSerializerMixin, serializers.ModelSerializer):
     date = serializers.DateField(required=True)
     start_time = serializers.TimeField(required=True, allow_null=False)
+    seats_left = serializers.ReadOnlyField()
+    sold_out = serializers.ReadOnlyField()
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
+        if 'chairs' in self.expand:
+            response['chairs'] = self.snapshot.seat_map(instance).chairs()
+        return response
+
+    class Meta:
+        model = Seance
+        fields = ('id', 'date', 'start_time', 'room', 'film', 'capacity', 'seats_left', 'sold_out', )
+        list_serializer_class = SnapshotListSerializer
+
+
+class SeanceProposalSerializer(serializers.Serializer):
+    room = serializers.IntegerField()
+    film = serializers.IntegerField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+
+
+class SeancePlanSerializer(serializers.Serializer):
+    seances = SeanceProposalSerializer(many=True, allow_empty=False)
+
+    def validate_seances(self, proposals):
+        rooms = Room.objects.in_bulk({proposal['room'] for proposal in proposals})
+        films = Film.objects.in_bulk({proposal['film'] for proposal in proposals})
+
+        errors = {}
+        for index, proposal in enumerate(proposals):
+            if proposal['room'] not in rooms or proposal['film'] not in films:
+                errors[index] = 'Unknown room or film'
+        if errors:
+            raise ValidationError(errors)
 
-        chairs = OrderedDict()
-        seats = Seat.objects.filter(room=instance.room.id).prefetch_related('booking_set')
-        if seats.exists:
-            for seat_instance in seats:
-                booking = seat_instance.booking_set.first()
-                chairs[seat_instance.id] = True if booking else False
+        seances = [
+            Seance(
+                room=rooms[proposal['room']], film=films[proposal['film']],
+                date=proposal['date'], start_time=proposal['start_time'],
+            )
+            for proposal in proposals
+        ]
+        errors = plan_seances(seances)
+        if errors:
+            raise ValidationError(errors)
+
+        capacities = room_capacities(rooms)
+        for seance in seances:
+            seance.capacity = capacities.get(seance.room_id, 0)
+
+        return seances
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            seances = Seance.objects.bulk_create(validated_data['seances'], batch_size=PLAN_BATCH_SIZE)
+            bump_catalogue_version_on_commit()
+            bump_schedule_generation_on_commit()
+        return {'seances': seances}
+
+    def to_representation(self, instance):
+        return {'created': len(instance['seances'])}
 
-        response['chairs'] = chairs
+
+class ArchivedSeanceSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+
+    def to_representation(self, instance):
+        response = super().to_representation(instance)
+        if 'bookings' in self.expand:
+            response['bookings'] = unpack_bookings(instance)
         return response
 
     class Meta:
-        model = Seance
-        fields = ('id', 'date', 'start_time', 'room', 'film', )
+        model = ArchivedSeance
+        fields = (
+            'seance_id', 'date', 'start_time', 'room_id', 'room_name', 'film_id', 'film_name', 'capacity',
+            'booked_count', 'revenue', 'archived_at',
+        )
+        read_only_fields = fields
+
+
+class QuoteSerializer(serializers.Serializer):
+    seats = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=MAX_BULK_SEATS)
+
+    def validate_seats(self, seat_ids):
+        if len(set(seat_ids)) != len(seat_ids):
+            raise ValidationError('Seats must not repeat')
+        return seat_ids
+
+    def validate(self, attrs):
+        attrs['seance'] = self.context['view'].get_object()
+        attrs['prices'] = price_seats(attrs['seance'], attrs['seats'])
+        if len(attrs['prices']) != len(attrs['seats']):
+            raise ValidationError({'error_message': 'All seats must exist in the seance room'})
+        return attrs
+
+    def to_representation(self, instance):
+        prices = instance['prices']
+        return {
+            'seance': instance['seance'].id,
+            'seats': [
+                {'seat': seat_id, 'category': prices[seat_id][0], 'price': str(prices[seat_id][1])}
+                for seat_id in instance['seats']
+            ],
+            'total': str(sum(price for _, price in prices.values())),
+        }
+
+
+class WaitingRoomSerializer(serializers.Serializer):
+    rate = serializers.FloatField(min_value=0.1, help_text='Tickets admitted per second')
+    burst = serializers.IntegerField(min_value=0, default=0, help_text='Tickets admitted as soon as it opens')
+
+
+class ScheduleQuerySerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
 
 
 class ReserveSerializer(serializers.ModelSerializer):
@@ -112,6 +393,51 @@ class ReserveSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    def create(self, validated_data):
+        with seat_conflict_guard('Have already reserved that seat'):
+            return super().create(validated_data)
+
     class Meta:
         model = Reserve
         fields = ('seat', 'seance', )
+
+
+class HoldSerializer(serializers.ModelSerializer):
+
+    def validate(self, attrs):
+        if attrs['seat'].room_id != attrs['seance'].room_id:
+            raise ValidationError({'error_message': 'That seat is not in the seance room'})
+
+        attrs['user'] = self.context['request'].user
+        return attrs
+
+    def create(self, validated_data):
+        return hold_seat(**validated_data)
+
+    class Meta:
+        model = Hold
+        fields = ('id', 'seat', 'seance', 'expires_at', )
+        read_only_fields = ('expires_at', )
+
+
+class ReportFilterSerializer(serializers.Serializer):
+    export = serializers.ChoiceField(choices=[CSV, JSON_LINES], default=CSV)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    film = serializers.IntegerField(required=False, min_value=1)
+    room = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise ValidationError({'error_message': 'date_from is after date_to'})
+        return attrs
+
+    @property
+    def filters(self):
+        data = self.validated_data
+        return {
+            'date_from': data.get('date_from'),
+            'date_to': data.get('date_to'),
+            'film_id': data.get('film'),
+            'room_id': data.get('room'),
+        }
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from apps.task.authentication import revoke_cached_credentials
+from apps.task.caching import bump_catalogue_version_on_commit
+from apps.task.database import check_connections
+from apps.task.models import Film, Seance, Seat, Booking, Hold
+from apps.task.pricing import invalidate_room_categories_on_commit
+from apps.task.realtime import BOOKED, HELD, RELEASED, publish_on_commit
+from apps.task.schedule import bump_schedule_generation_on_commit
+
+
+def catalogue_changed(sender, **kwargs):
+    bump_catalogue_version_on_commit()
+
+
+def schedule_changed(sender, **kwargs):
+    bump_schedule_generation_on_commit()
+
+
+def seat_category_changed(sender, instance, **kwargs):
+    invalidate_room_categories_on_commit(instance.room_id)
+
+
+def seat_taken(sender, instance, **kwargs):
+    publish_on_commit(instance.seance_id, [(instance.seat_id, BOOKED if sender is Booking else HELD)])
+
+
+def seat_released(sender, instance, **kwargs):
+    publish_on_commit(instance.seance_id, [(instance.seat_id, RELEASED)])
+
+
+def credentials_changed(sender, instance, **kwargs):
+    revoke_cached_credentials(instance.pk if sender is get_user_model() else instance.user_id)
+
+
+def user_logged_out_handler(sender, request, user, **kwargs):
+    if user is not None:
+        revoke_cached_credentials(user.pk)
+
+
+for model in (Film, Seance, Booking, Hold):
+    post_save.connect(catalogue_changed, sender=model, dispatch_uid='catalogue_changed_save_{}'.format(model.__name__))
+    post_delete.connect(
+        catalogue_changed, sender=model, dispatch_uid='catalogue_changed_delete_{}'.format(model.__name__)
+    )
+
+for model in (Film, Seance):
+    post_save.connect(schedule_changed, sender=model, dispatch_uid='schedule_changed_save_{}'.format(model.__name__))
+    post_delete.connect(
+        schedule_changed, sender=model, dispatch_uid='schedule_changed_delete_{}'.format(model.__name__)
+    )
+
+post_save.connect(seat_category_changed, sender=Seat, dispatch_uid='seat_category_changed_save')
+post_delete.connect(seat_category_changed, sender=Seat, dispatch_uid='seat_category_changed_delete')
+
+for model in (Booking, Hold):
+    post_save.connect(seat_taken, sender=model, dispatch_uid='seat_taken_{}'.format(model.__name__))
+    post_delete.connect(seat_released, sender=model, dispatch_uid='seat_released_{}'.format(model.__name__))
+
+post_save.connect(credentials_changed, sender=get_user_model(), dispatch_uid='credentials_changed_user')
+post_delete.connect(credentials_changed, sender=Token, dispatch_uid='credentials_changed_token')
+user_logged_out.connect(user_logged_out_handler, dispatch_uid='credentials_logged_out')
+request_started.connect(check_connections, dispatch_uid='check_connections')
@@ -1,3 +1,1058 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.task.archiving import archive_seances, unpack_bookings
+from apps.task.authentication import (
+    GENERATION_CACHE_KEY, TOKEN_CACHE_KEY, CachedTokenAuthentication, revoke_cached_credentials,
+)
+from apps.task.booking import book_seat, book_seats, cancel_booking, checkout_hold, hold_seat
+from apps.task.database import ReplicaRouter, use_primary, use_replica
+from apps.task.exceptions import SeatConflict
+from apps.task.idempotency import acquire, idempotency_cache_key, release, request_fingerprint, store_response
+from apps.task.instrumentation import registry
+from apps.task.middleware import QueryInstrumentationMiddleware
+from apps.task.mixins import CachedResponseMixin
+from apps.task.models import (
+    ArchivedSeance, Booking, Film, Hold, Notification, PriceTier, Reserve, Room, Seance, Seat, User, seance_bounds,
+)
+from apps.task.occupancy import RoomLayout, SeatMap
+from apps.task.outbox import claim_batch, drain_outbox
+from apps.task.pricing import price_seats
+from apps.task.realtime import BOOKED, RELEASED, SeatEventHub
+from apps.task.recommendation import recommend_blocks
+from apps.task.schedule import SCHEDULE_GENERATION_KEY, get_schedule
+from apps.task.scheduling import TOO_MANY_PARALLEL_MESSAGE, overlapping_seances, plan_seances, schedule_conflict
+from apps.task.serializers import ReserveSerializer
+
+
+def run_on_commit_immediately():
+    """TestCase never commits, so run on_commit callbacks such as cache invalidation right away."""
+    return mock.patch('django.db.transaction.on_commit', lambda callback: callback())
+
+
+@contextmanager
+def temporary_file(name, content):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, name)
+        with open(path, 'w', newline='') as file:
+            file.write(content)
+        yield path
+
+
+class CinemaTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'password')
+        cls.other_user = User.objects.create_user('other', 'other@example.com', 'password')
+        cls.room = cls.create_room('Room 1')
+        cls.film = Film.objects.create(name='Film', duration=datetime.time(2, 0))
+
+    @classmethod
+    def create_room(cls, room_name, rows=2, columns=4):
+        room = Room.objects.create(room_name=room_name)
+        Seat.objects.bulk_create([
+            Seat(room=room, row=row, column=column) for row in range(1, rows + 1) for column in range(1, columns + 1)
+        ])
+        return room
+
+    def create_seance(self, days=1, start_time=datetime.time(12, 0), room=None, film=None):
+        return Seance.objects.create(
+            room=room or self.room, film=film or self.film, date=timezone.localdate() + datetime.timedelta(days=days),
+            start_time=start_time,
+        )
+
+    def seats(self, room=None):
+        return list(Seat.objects.filter(room=room or self.room).order_by('row', 'column'))
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class ArchiveTests(CinemaTestCase):
+
+    def test_archives_seance_with_price_tier(self):
+        seance = self.create_seance(days=-100)
+        PriceTier.objects.create(seance=seance, category=Seat.STANDARD, price=Decimal('7.50'))
+        seat = self.seats()[0]
+        book_seat(self.user, seance, seat)
+
+        archived = [seance for chunk in archive_seances(timezone.localdate()) for seance in chunk]
+
+        self.assertEqual([seance.seance_id for seance in archived], [seance.id])
+        self.assertFalse(Seance.objects.filter(id=seance.id).exists())
+        self.assertFalse(PriceTier.objects.exists())
+        stored = ArchivedSeance.objects.get()
+        self.assertEqual(stored.revenue, Decimal('7.50'))
+        self.assertEqual(unpack_bookings(stored)[0]['price'], '7.50')
+
+    def test_bad_cutoff_date_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, 'YYYY-MM-DD'):
+            call_command('archive_seances', before='2020-13-01', dry_run=True)
+
+    def test_bad_archive_date_filter_is_rejected(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+        response = self.client_for(admin).get('/archive/seance/?date=yesterday')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ScheduleConflictTests(CinemaTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.rooms = [cls.room, cls.create_room('Room 2'), cls.create_room('Room 3')]
+
+    def conflict(self, room, start_time):
+        date = timezone.localdate() + datetime.timedelta(days=1)
+        return schedule_conflict(room.id, *seance_bounds(date, start_time, self.film.duration))
+
+    def planned(self, room, start_time):
+        return Seance(
+            room=room, film=self.film, date=timezone.localdate() + datetime.timedelta(days=1), start_time=start_time
+        )
+
+    def test_counts_seances_running_at_the_same_moment(self):
+        self.create_seance(room=self.rooms[0], start_time=datetime.time(10, 0))
+        self.create_seance(room=self.rooms[1], start_time=datetime.time(13, 0))
+
+        self.assertIsNone(self.conflict(self.rooms[2], datetime.time(11, 0)))
+        self.assertEqual(plan_seances([self.planned(self.rooms[2], datetime.time(11, 0))]), {})
+
+    def test_rejects_a_third_parallel_seance(self):
+        self.create_seance(room=self.rooms[0], start_time=datetime.time(10, 0))
+        self.create_seance(room=self.rooms[1], start_time=datetime.time(11, 0))
+
+        self.assertEqual(self.conflict(self.rooms[2], datetime.time(11, 30)), TOO_MANY_PARALLEL_MESSAGE)
+        self.assertEqual(
+            plan_seances([self.planned(self.rooms[2], datetime.time(11, 30))]), {0: TOO_MANY_PARALLEL_MESSAGE}
+        )
+
+    def test_film_duration_change_moves_seance_end(self):
+        film = Film.objects.create(name='Extended', duration=datetime.time(2, 0))
+        seance = self.create_seance(start_time=datetime.time(10, 0), film=film)
+        film.duration = datetime.time(3, 30)
+        film.save()
+
+        seance.refresh_from_db()
+        self.assertEqual(timezone.localtime(seance.ends_at).time(), datetime.time(13, 30))
+        starts_at, ends_at = seance_bounds(seance.date, datetime.time(13, 0), datetime.time(1, 0))
+        self.assertIn(seance, overlapping_seances(starts_at, ends_at))
+
+
+class BookingConflictTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_booking_a_booked_seat_conflicts(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        data = {'seance': seance.id, 'seat': seat.id}
+
+        self.assertEqual(self.client_for(self.user).post('/booking/', data).status_code, status.HTTP_201_CREATED)
+        response = self.client_for(self.other_user).post('/booking/', data)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Booking.objects.get().user, self.user)
+        seance.refresh_from_db()
+        self.assertEqual(seance.booked_count, 1)
+
+    def test_bulk_booking_is_all_or_nothing(self):
+        seance = self.create_seance()
+        seats = self.seats()[:3]
+        book_seat(self.other_user, seance, seats[1])
+
+        response = self.client_for(self.user).post(
+            '/booking/bulk/', {'seance': seance.id, 'seats': [seat.id for seat in seats]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(list(Booking.objects.values_list('user', flat=True)), [self.other_user.id])
+        seance.refresh_from_db()
+        self.assertEqual(seance.booked_count, 1)
+
+    def test_holding_a_booked_seat_conflicts(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        book_seat(self.other_user, seance, seat)
+
+        response = self.client_for(self.user).post('/hold/', {'seance': seance.id, 'seat': seat.id})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_booking_a_seat_held_by_another_user_conflicts(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        hold_seat(self.other_user, seance, seat)
+
+        response = self.client_for(self.user).post('/booking/', {'seance': seance.id, 'seat': seat.id})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_checking_out_an_expired_hold_conflicts(self):
+        seance = self.create_seance()
+        hold = hold_seat(self.user, seance, self.seats()[0])
+        Hold.objects.filter(id=hold.id).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        response = self.client_for(self.user).post('/hold/{}/checkout/'.format(hold.id))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_moving_a_booking_onto_a_held_seat_conflicts(self):
+        seance = self.create_seance()
+        first, second = self.seats()[:2]
+        booking = book_seat(self.user, seance, first)
+        hold = hold_seat(self.other_user, seance, second)
+
+        response = self.client_for(self.user).patch('/booking/{}/'.format(booking.id), {'seat': second.id})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Booking.objects.get(id=booking.id).seat_id, first.id)
+        self.assertEqual(checkout_hold(hold).seat_id, second.id)
+
+    def test_concurrent_reserve_conflicts(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        request = mock.Mock(user=self.user)
+        serializer = ReserveSerializer(data={'seance': seance.id, 'seat': seat.id}, context={'request': request})
+        self.assertTrue(serializer.is_valid())
+        Reserve.objects.create(seance=seance, seat=seat, user=self.user)
+
+        with self.assertRaises(SeatConflict):
+            serializer.save()
+
+
+class CredentialsCacheTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.cache_key = TOKEN_CACHE_KEY.format(self.token.key)
+
+    def test_caches_token_check(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+    def test_revocation_during_authentication_is_not_cached(self):
+        authenticate = TokenAuthentication.authenticate_credentials
+
+        def revoke_midway(authentication, key):
+            credentials = authenticate(authentication, key)
+            revoke_cached_credentials(self.user.pk)
+            return credentials
+
+        with mock.patch.object(TokenAuthentication, 'authenticate_credentials', revoke_midway):
+            CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertIsNone(CachedTokenAuthentication().get_cached(self.cache_key))
+
+    def test_evicted_generation_does_not_match_cached_entry(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        cache.delete(GENERATION_CACHE_KEY.format(self.user.pk))
+
+        with mock.patch('apps.task.caching.time.time', return_value=time.time() + 1):
+            self.assertIsNone(CachedTokenAuthentication().get_cached(self.cache_key))
+
+
+class PricingTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seat_category_change_reprices(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        PriceTier.objects.create(film=self.film, category='vip', price=Decimal('25.00'))
+        self.assertEqual(price_seats(seance, [seat.id])[seat.id], (Seat.STANDARD, Decimal('10.00')))
+
+        with run_on_commit_immediately():
+            seat.category = 'vip'
+            seat.save()
+
+        self.assertEqual(price_seats(seance, [seat.id])[seat.id], ('vip', Decimal('25.00')))
+
+    def test_seance_tier_with_a_film_only_prices_its_seance(self):
+        seance, other_seance = self.create_seance(), self.create_seance(days=2)
+        seat = self.seats()[0]
+        PriceTier.objects.create(film=self.film, seance=seance, category=Seat.STANDARD, price=Decimal('4.00'))
+
+        self.assertEqual(price_seats(seance, [seat.id])[seat.id], (Seat.STANDARD, Decimal('4.00')))
+        self.assertEqual(price_seats(other_seance, [seat.id])[seat.id], (Seat.STANDARD, Decimal('10.00')))
+
+    def test_quote(self):
+        seance = self.create_seance()
+        seats = self.seats()[:2]
+
+        response = self.client_for(self.user).post(
+            '/seance/{}/quote/'.format(seance.id), {'seats': [seat.id for seat in seats]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], '20.00')
+        self.assertEqual([seat['seat'] for seat in response.data['seats']], [seat.id for seat in seats])
+
+    def test_quote_for_a_seat_of_another_room_is_rejected(self):
+        seance = self.create_seance()
+        other_seat = self.seats(self.create_room('Room 2'))[0]
+
+        response = self.client_for(self.user).post(
+            '/seance/{}/quote/'.format(seance.id), {'seats': [other_seat.id]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error_message'][0], 'All seats must exist in the seance room')
+
+
+class BookingThrottleTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(BOOKING_USER_BUCKET=(0.001, 1))
+    def test_idempotent_replay_is_not_throttled(self):
+        seance = self.create_seance()
+        first, second = self.seats()[:2]
+        client = self.client_for(self.user)
+
+        booked = client.post('/booking/', {'seance': seance.id, 'seat': first.id}, HTTP_IDEMPOTENCY_KEY='retry')
+        replayed = client.post('/booking/', {'seance': seance.id, 'seat': first.id}, HTTP_IDEMPOTENCY_KEY='retry')
+        throttled = client.post('/booking/', {'seance': seance.id, 'seat': second.id})
+
+        self.assertEqual(booked.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class OutboxTests(CinemaTestCase):
+
+    def setUp(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        Reserve.objects.create(seance=seance, seat=seat, user=self.other_user)
+        cancel_booking(book_seat(self.user, seance, seat))
+
+    def test_released_seat_mails_the_waitlist(self):
+        self.assertEqual(drain_outbox(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.other_user.email])
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(Reserve.objects.exists())
+
+    def test_failed_send_is_released_for_retry(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            self.assertEqual(drain_outbox(), (0, 1))
+
+        notification = Notification.objects.get()
+        self.assertEqual((notification.attempts, notification.claimed_at), (1, None))
+        self.assertEqual(drain_outbox(), (1, 0))
+
+    def test_claimed_notifications_are_not_claimed_twice(self):
+        self.assertEqual(len(claim_batch(10, 5)), 1)
+        self.assertEqual(claim_batch(10, 5), [])
+        self.assertEqual(drain_outbox(), (0, 0))
+
+
+class ReplicaRouterTests(TestCase):
+
+    @mock.patch('apps.task.database.replica_alias', return_value='replica')
+    def test_credentials_are_read_from_the_primary(self, replica_alias):
+        router = ReplicaRouter()
+        with use_replica():
+            self.assertEqual(router.db_for_read(Seance), 'replica')
+            self.assertEqual(router.db_for_read(Token), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_read(Seance), 'default')
+        with use_replica(), use_primary():
+            self.assertEqual(router.db_for_read(Seance), 'default')
+
+    @mock.patch('apps.task.database.replica_alias', return_value='replica')
+    def test_cached_responses_are_filled_from_the_primary(self, replica_alias):
+        cache.clear()
+        databases = []
+
+        def render(request):
+            databases.append(ReplicaRouter().db_for_read(Seance))
+            return Response({'seances': []})
+
+        with use_replica():
+            for _ in range(2):
+                response = CachedResponseMixin().cached_response(render, Request(APIRequestFactory().get('/seance/')))
+                self.assertEqual(response.data, {'seances': []})
+
+        self.assertEqual(databases, ['default'])
+
+
+
+class CachedResponseTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def film_names(self, response):
+        return [film['name'] for film in response.data]
+
+    def test_unchanged_response_revalidates_without_queries(self):
+        first = APIClient().get('/film/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = APIClient().get('/film/', HTTP_IF_NONE_MATCH='"other", {}'.format(first['ETag']))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        with self.assertNumQueries(0):
+            response = APIClient().get('/film/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, first.data)
+
+    def test_write_bumps_the_cached_version(self):
+        first = APIClient().get('/film/')
+        Film.objects.filter(id=self.film.id).update(name='Renamed')
+        self.assertEqual(self.film_names(APIClient().get('/film/')), ['Film'])
+
+        with run_on_commit_immediately():
+            Film.objects.create(name='New film', duration=datetime.time(1, 30))
+        response = APIClient().get('/film/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(sorted(self.film_names(response)), ['New film', 'Renamed'])
+
+    def test_query_string_is_part_of_the_cache_key(self):
+        other_film = Film.objects.create(name='Other film', duration=datetime.time(1, 30))
+        seance = self.create_seance()
+        other_seance = self.create_seance(film=other_film)
+
+        response = APIClient().get('/seance/?film_id={}'.format(self.film.id))
+        other_response = APIClient().get('/seance/?film_id={}'.format(other_film.id))
+
+        self.assertEqual([row['id'] for row in response.data['results']], [seance.id])
+        self.assertEqual([row['id'] for row in other_response.data['results']], [other_seance.id])
+        self.assertNotEqual(response['ETag'], other_response['ETag'])
+        reordered = APIClient().get('/seance/?fields=id&film_id={}'.format(self.film.id))
+        self.assertEqual(
+            reordered['ETag'], APIClient().get('/seance/?film_id={}&fields=id'.format(self.film.id))['ETag']
+        )
+
+class QueryCountTests(CinemaTestCase):
+    """List pages run the same queries however many rows, seances and rooms they render."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.client_for(self.user)
+
+    def add_seances(self, count, days=1):
+        rooms = [self.room, self.create_room('Room {}'.format(Room.objects.count() + 1))]
+        for number in range(count):
+            room = rooms[number % 2]
+            seance = self.create_seance(days=days + number, room=room)
+            book_seats(self.user, seance, [seat.id for seat in self.seats(room)[:2]])
+
+    def assertConstantQueries(self, queries, url, days=1):
+        for count in (2, 6):
+            self.add_seances(count, days=days + 10 * count)
+            cache.clear()
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_seance_list(self):
+        response = self.assertConstantQueries(1, '/seance/?page_size=100')
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_seance_list_with_chairs(self):
+        response = self.assertConstantQueries(3, '/seance/?expand=chairs&page_size=100')
+        self.assertEqual(sum(response.data['results'][0]['chairs'].values()), 2)
+
+    def test_seance_detail(self):
+        self.add_seances(1)
+        seance = Seance.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get('/seance/{}/'.format(seance.id))
+        self.assertEqual(len(response.data['chairs']), 8)
+
+    def test_booking_list(self):
+        response = self.assertConstantQueries(1, '/booking/?page_size=100')
+        self.assertEqual(len(response.data['results']), 16)
+
+    def test_booking_list_with_nested_seance_and_chairs(self):
+        response = self.assertConstantQueries(3, '/booking/?expand=seance,chairs&page_size=100')
+        nested = response.data['results'][0]['seance']
+        self.assertEqual(nested['id'], Booking.objects.get(id=response.data['results'][0]['id']).seance_id)
+        self.assertEqual(sum(nested['chairs'].values()), 2)
+
+    def test_my_bookings(self):
+        response = self.assertConstantQueries(1, '/booking/mine/?page_size=100')
+        self.assertEqual(len(response.data['results']), 16)
+        self.assertEqual(response.data['results'][0]['film_name'], self.film.name)
+
+
+class ExpandableFieldsTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seance = self.create_seance()
+
+    def test_selects_fields(self):
+        response = self.client_for(self.user).get('/seance/?fields=id,date')
+
+        self.assertEqual(response.data['results'], [{'id': self.seance.id, 'date': self.seance.date.isoformat()}])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client_for(self.user).get('/seance/?fields=id,dte')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('dte', response.data['error_message'])
+        self.assertIn('start_time', response.data['error_message'])
+
+    def test_fields_only_trim_the_output_of_writes(self):
+        first, second = self.seats()[:2]
+        client = self.client_for(self.user)
+
+        created = client.post('/booking/?fields=id', {'seance': self.seance.id, 'seat': first.id})
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(created.data), {'id'})
+
+        moved = client.patch('/booking/{}/?fields=id'.format(created.data['id']), {'seat': second.id})
+        self.assertEqual(moved.status_code, status.HTTP_200_OK)
+        self.assertEqual(Booking.objects.get(id=created.data['id']).seat_id, second.id)
+
+
+class RecommendationTests(SimpleTestCase):
+
+    def seat_map(self, rows, columns, occupied=()):
+        seats = [(row * 100 + column, row, column) for row in rows for column in columns]
+        seat_map = SeatMap(RoomLayout(seats))
+        for seat_id in occupied:
+            seat_map.mark(seat_id)
+        return seat_map
+
+    def test_most_central_block_first(self):
+        blocks = recommend_blocks(self.seat_map(range(1, 4), range(1, 8)), seats=3, limit=2)
+
+        self.assertEqual(blocks[0]['row'], 2)
+        self.assertEqual(blocks[0]['columns'], [3, 4, 5])
+        self.assertEqual(blocks[0]['seats'], [203, 204, 205])
+        self.assertEqual(len(blocks), 2)
+
+    def test_blocks_skip_occupied_seats_and_aisles(self):
+        seat_map = self.seat_map([1], [1, 2, 3, 5, 6, 7], occupied=[102])
+
+        blocks = recommend_blocks(seat_map, seats=2, limit=10)
+
+        self.assertEqual(sorted(block['columns'] for block in blocks), [[5, 6], [6, 7]])
+
+    def test_columns_numbered_from_zero(self):
+        seat_map = self.seat_map([1], range(0, 5), occupied=[100])
+
+        blocks = recommend_blocks(seat_map, seats=4, limit=5)
+
+        self.assertEqual([block['columns'] for block in blocks], [[1, 2, 3, 4]])
+        self.assertEqual(blocks[0]['seats'], [101, 102, 103, 104])
+
+    def test_no_block_when_too_few_adjacent_seats(self):
+        self.assertEqual(recommend_blocks(self.seat_map([1], range(1, 4), occupied=[102]), seats=2), [])
+
+
+class RecommendViewTests(CinemaTestCase):
+
+    def test_recommends_in_a_room_numbered_from_zero(self):
+        room = Room.objects.create(room_name='Zero')
+        Seat.objects.bulk_create([Seat(room=room, row=1, column=column) for column in range(0, 6)])
+        seance = self.create_seance(room=room)
+
+        response = self.client_for(self.user).get('/seance/{}/recommend/?seats=2'.format(seance.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['blocks'][0]['columns'], [2, 3])
+
+
+class ScheduleCacheTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_evicted_generation_does_not_serve_an_old_schedule(self):
+        seance = self.create_seance()
+        self.assertEqual(len(get_schedule(seance.date)['films'][0]['seances']), 1)
+
+        with run_on_commit_immediately():
+            self.create_seance(room=self.create_room('Room 2'))
+        self.assertEqual(len(get_schedule(seance.date)['films'][0]['seances']), 2)
+
+        cache.delete(SCHEDULE_GENERATION_KEY)
+        with mock.patch('apps.task.caching.time.time', return_value=time.time() + 1):
+            self.assertEqual(len(get_schedule(seance.date)['films'][0]['seances']), 2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersTests(CinemaTestCase):
+
+    def import_users(self, lines):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with temporary_file('users.csv', '\n'.join(lines) + '\n') as path:
+            call_command('import_users', path, workers=1, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        stdout, stderr = self.import_users([
+            'username,email,password',
+            'alice,alice@example.com,secret',
+            'bob,bob@example.com',
+            'carol,not-an-email,secret',
+            'user,new@example.com,secret',
+            'dave,dave@example.com,secret,extra',
+            'alice,alice2@example.com,secret',
+        ])
+
+        self.assertIn('Registered 1 users, skipped 2 existing and 3 invalid.', stdout)
+        self.assertIn('Line 3: expected 3 columns, got 2', stderr)
+        self.assertIn('Line 4: email:', stderr)
+        self.assertIn('Line 6: expected 3 columns, got 4', stderr)
+        alice = User.objects.get(username='alice')
+        self.assertEqual(alice.email, 'alice@example.com')
+        self.assertTrue(alice.check_password('secret'))
+        self.assertFalse(User.objects.filter(username__in=['bob', 'carol', 'dave']).exists())
+
+    def test_rejects_fields_longer_than_the_api_allows(self):
+        stdout, stderr = self.import_users(['{},long@example.com,secret'.format('x' * 31)])
+
+        self.assertIn('Line 1: username:', stderr)
+        self.assertFalse(User.objects.filter(email='long@example.com').exists())
+
+
+class SeatEventHubTests(SimpleTestCase):
+
+    def test_reconnecting_client_gets_only_what_it_missed(self):
+        hub = SeatEventHub(backlog=3, max_channels=10)
+        hub.publish(1, [(10, BOOKED)])
+        since = hub.version(1)
+        hub.publish(1, [(11, BOOKED), (10, RELEASED)])
+
+        version, changes = hub.changes_since(1, since)
+
+        self.assertEqual(version, since + 2)
+        self.assertEqual(changes, [{'seat': 11, 'state': BOOKED}, {'seat': 10, 'state': RELEASED}])
+        self.assertEqual(hub.changes_since(1, version), (version, []))
+
+    def test_version_outside_the_backlog_needs_a_snapshot(self):
+        hub = SeatEventHub(backlog=2, max_channels=10)
+        hub.publish(1, [(10, BOOKED)])
+        since = hub.version(1)
+        hub.publish(1, [(11, BOOKED), (12, BOOKED), (13, BOOKED)])
+
+        self.assertIsNone(hub.changes_since(1, since)[1])
+        self.assertIsNone(hub.changes_since(1, hub.version(1) + 1)[1])
+
+    def test_least_recently_published_seance_is_pruned(self):
+        hub = SeatEventHub(backlog=2, max_channels=2)
+        hub.publish(1, [(10, BOOKED)])
+        hub.publish(2, [(20, BOOKED)])
+        since = hub.version(2)
+        hub.publish(1, [(11, BOOKED)])
+        hub.publish(3, [(30, BOOKED)])
+
+        self.assertEqual(list(hub.channels), [1, 3])
+        self.assertIsNone(hub.changes_since(2, since)[1])
+        hub.publish(2, [(21, BOOKED)])
+        self.assertIsNone(hub.changes_since(2, since)[1])
+
+    def test_wait_wakes_up_on_publish(self):
+        hub = SeatEventHub(backlog=2, max_channels=10)
+        hub.publish(1, [(10, BOOKED)])
+        since = hub.version(1)
+        threading.Timer(0.05, hub.publish, (1, [(11, BOOKED)])).start()
+
+        version, changes = hub.wait(1, since, timeout=5)
+
+        self.assertEqual(version, since + 1)
+        self.assertEqual(changes, [{'seat': 11, 'state': BOOKED}])
+
+
+@override_settings(SEAT_EVENTS_STREAM_SECONDS=0.2, SEAT_EVENTS_HEARTBEAT_SECONDS=0.05)
+class SeatEventStreamTests(CinemaTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('apps.task.views.hub', SeatEventHub(backlog=10, max_channels=10))
+        self.hub = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, path, **extra):
+        response = self.client_for(self.user).get(path, **extra)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_new_client_gets_a_snapshot(self):
+        seance = self.create_seance()
+
+        response, body = self.stream('/seance/{}/events/'.format(seance.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(body.startswith('id: 0\nevent: snapshot\ndata: '))
+        self.assertIn(': keepalive', body)
+
+    def test_reconnecting_client_gets_missed_deltas(self):
+        seance = self.create_seance()
+        seat = self.seats()[0]
+        self.hub.publish(seance.id, [(seat.id, BOOKED)])
+        since = self.hub.version(seance.id)
+        self.hub.publish(seance.id, [(seat.id, RELEASED)])
+
+        response, body = self.stream('/seance/{}/events/'.format(seance.id), HTTP_LAST_EVENT_ID=str(since))
+
+        self.assertTrue(body.startswith(
+            'id: {}\nevent: delta\ndata: [{{"seat": {}, "state": "released"}}]\n\n'.format(since + 1, seat.id)
+        ))
+
+    def test_errors_are_sent_as_an_error_event(self):
+        response = self.client_for(self.user).get('/seance/0/events/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+        self.assertEqual(response.content, b'event: error\ndata: {"detail": "Not found."}\n\n')
+
+    def test_not_acceptable_is_sent_as_an_error_event(self):
+        seance = self.create_seance()
+
+        response = self.client_for(self.user).get(
+            '/seance/{}/events/'.format(seance.id), HTTP_ACCEPT='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertTrue(response.content.startswith(b'event: error\ndata: {"detail": '))
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=2)
+class InstrumentationTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_records_queries_and_timings_per_endpoint(self):
+        response = APIClient().get('/seance/')
+        APIClient().get('/film/')
+
+        report = registry.report()
+        self.assertEqual(sorted(report), ['GET film-list', 'GET seance-list'])
+        seance_list = report['GET seance-list']
+        self.assertEqual(seance_list['requests'], 1)
+        self.assertEqual(seance_list['queries']['p50'], 1)
+        self.assertEqual(seance_list['bytes']['p50'], len(response.content))
+        self.assertGreater(seance_list['view_ms']['p50'], 0)
+        self.assertGreater(seance_list['render_ms']['p50'], 0)
+        self.assertGreaterEqual(seance_list['total_ms']['p50'], seance_list['view_ms']['p50'])
+        self.assertEqual(seance_list['n_plus_one'], {})
+
+    def test_flags_repeated_queries(self):
+        def get_response(request):
+            for film_id in range(3):
+                list(Film.objects.filter(id=film_id))
+            return HttpResponse()
+
+        request = RequestFactory().get('/film/')
+        request.resolver_match = mock.Mock(view_name='film-list')
+        with self.assertLogs('apps.task.instrumentation', 'WARNING') as logs:
+            QueryInstrumentationMiddleware(get_response)(request)
+
+        templates = registry.report()['GET film-list']['n_plus_one']
+        self.assertEqual(list(templates.values()), [3])
+        self.assertTrue(list(templates)[0].startswith('SELECT "task_film"."id"'))
+        self.assertIn('Possible N+1 in GET film-list: 3 x', logs.output[0])
+
+    def test_report_endpoint(self):
+        APIClient().get('/film/')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+        self.assertEqual(self.client_for(self.user).get('/instrumentation/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client_for(admin).get('/instrumentation/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['GET film-list']['requests'], 1)
+
+        self.assertEqual(self.client_for(admin).delete('/instrumentation/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(registry.report()), ['DELETE instrumentation'])
+
+
+class ProvisionRoomsTests(CinemaTestCase):
+
+    def provision(self, *rooms):
+        stdout = io.StringIO()
+        with temporary_file('layout.json', json.dumps({'rooms': list(rooms)})) as path:
+            call_command('provision_rooms', path, stdout=stdout)
+        return stdout.getvalue()
+
+    def layout(self, room_name='Hall'):
+        return {
+            (seat.row, seat.column): (seat.id, seat.category)
+            for seat in Seat.objects.filter(room__room_name=room_name)
+        }
+
+    def test_re_running_a_layout_changes_nothing(self):
+        hall = {'room_name': 'Hall', 'rows': ['SS.SS', 'VVVVV'], 'categories': {'S': 'standard', 'V': 'vip'}}
+
+        self.assertIn('Hall: 9 created, 0 updated, 0 deleted', self.provision(hall))
+        layout = self.layout()
+        output = self.provision(hall)
+
+        self.assertIn('Hall: 0 created, 0 updated, 0 deleted', output)
+        self.assertIn('1 rooms, 0 seats created, 0 updated, 0 deleted', output)
+        self.assertEqual(self.layout(), layout)
+        self.assertEqual(layout[(1, 4)][1], 'standard')
+        self.assertNotIn((1, 3), layout)
+
+    def test_changed_layout_reports_the_diff(self):
+        self.provision({'room_name': 'Hall', 'rows': ['SSSS', 'SSSS']})
+        seance = self.create_seance(room=Room.objects.get(room_name='Hall'))
+        layout = self.layout()
+
+        output = self.provision(
+            {'room_name': 'Hall', 'rows': ['SSS', 'SVVS', 'SS'], 'categories': {'S': 'standard', 'V': 'vip'}},
+            {'room_name': 'Foyer', 'rows': ['S']},
+        )
+
+        self.assertIn('Hall: 2 created, 2 updated, 1 deleted', output)
+        self.assertIn('Foyer: 1 created, 0 updated, 0 deleted', output)
+        self.assertIn('2 rooms, 3 seats created, 2 updated, 1 deleted', output)
+        new_layout = self.layout()
+        self.assertEqual(new_layout[(2, 2)], (layout[(2, 2)][0], 'vip'))
+        self.assertEqual(len(new_layout), 9)
+        seance.refresh_from_db()
+        self.assertEqual(seance.capacity, 9)
+
+    def test_booked_seat_is_not_removed(self):
+        self.provision({'room_name': 'Hall', 'rows': ['SS']})
+        hall = Room.objects.get(room_name='Hall')
+        book_seat(self.user, self.create_seance(room=hall), Seat.objects.get(room=hall, column=2))
+
+        with self.assertRaisesMessage(CommandError, 'Cannot remove booked seats from Hall'):
+            self.provision({'room_name': 'Hall', 'rows': ['S']})
+        self.assertEqual(len(self.layout()), 2)
+
+
+class ExportTests(CinemaTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        cache.clear()
+        self.seance = self.create_seance()
+        self.bookings = [
+            book_seat(user, self.seance, seat) for user, seat in zip((self.user, self.other_user), self.seats())
+        ]
+
+    def export(self, path):
+        response = self.client_for(self.admin).get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_bookings_csv(self):
+        response, body = self.export('/reports/bookings/')
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings.csv"')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row['booking_id'] for row in rows], [str(booking.id) for booking in self.bookings])
+        self.assertEqual(rows[0], {
+            'booking_id': str(self.bookings[0].id), 'date': self.seance.date.isoformat(), 'start_time': '12:00:00',
+            'seance_id': str(self.seance.id), 'film_id': str(self.film.id), 'film_name': 'Film',
+            'room_id': str(self.room.id), 'room_name': 'Room 1', 'row': '1', 'column': '1', 'category': 'standard',
+            'price': '10.00', 'user_id': str(self.user.id), 'username': 'user',
+        })
+
+    def test_bookings_are_read_in_chunks(self):
+        with mock.patch('apps.task.reports.EXPORT_CHUNK_SIZE', 1):
+            response, body = self.export('/reports/bookings/?export=jsonl')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['booking_id'] for row in rows], [booking.id for booking in self.bookings])
+        self.assertEqual(rows[0]['date'], self.seance.date.isoformat())
+        self.assertEqual(rows[0]['price'], '10.00')
+
+    def test_film_totals_jsonl_with_filters(self):
+        other_film = Film.objects.create(name='Other film', duration=datetime.time(1, 30))
+        book_seat(self.user, self.create_seance(days=3, film=other_film), self.seats()[0])
+
+        response, body = self.export('/reports/films/?export=jsonl&date_to={}'.format(self.seance.date))
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(Decimal(rows[0].pop('revenue')), Decimal('20.00'))
+        self.assertEqual(rows, [{
+            'film_id': self.film.id, 'film_name': 'Film', 'bookings': 2, 'seances': 1, 'customers': 2,
+        }])
+
+    def test_unknown_report_and_bad_filters_are_rejected(self):
+        client = self.client_for(self.admin)
+
+        self.assertEqual(client.get('/reports/unknown/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(client.get('/reports/films/?export=xml').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client_for(self.user).get('/reports/films/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_writes_the_report_to_a_file(self):
+        with temporary_file('occupancy.csv', '') as path:
+            call_command('export_bookings', 'occupancy', output=path)
+            with open(path, newline='') as export_file:
+                rows = list(csv.DictReader(export_file))
+
+        self.assertEqual(rows, [{
+            'id': str(self.seance.id), 'date': self.seance.date.isoformat(), 'start_time': '12:00:00',
+            'film_name': 'Film', 'room_name': 'Room 1', 'capacity': '8', 'booked': '2', 'revenue': '20.00',
+        }])
+
+    def test_command_rejects_reversed_dates(self):
+        with self.assertRaisesMessage(CommandError, 'date_from is after date_to'):
+            call_command('export_bookings', date_from='2020-02-01', date_to='2020-01-01')
+
+
+class IdempotencyTests(CinemaTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seance = self.create_seance()
+        self.seat, self.other_seat = self.seats()[:2]
+        self.data = {'seance': self.seance.id, 'seat': self.seat.id}
+
+    def book(self, data, key='key-1', user=None):
+        return self.client_for(user or self.user).post('/booking/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.book(self.data)
+        retry = self.book(self.data)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_failed_response_is_replayed_too(self):
+        book_seat(self.other_user, self.seance, self.seat)
+
+        first = self.book(self.data)
+        Booking.objects.all().delete()
+        retry = self.book(self.data)
+
+        self.assertEqual(first.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(retry.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_key_reused_with_a_different_body_is_rejected(self):
+        self.book(self.data)
+
+        response = self.book({'seance': self.seance.id, 'seat': self.other_seat.id})
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(list(Booking.objects.values_list('seat_id', flat=True)), [self.seat.id])
+
+    def test_keys_are_per_user(self):
+        self.book(self.data)
+
+        response = self.book({'seance': self.seance.id, 'seat': self.other_seat.id}, user=self.other_user)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        cache_key = idempotency_cache_key(self.user.pk, '/booking/', 'key-1')
+        self.assertTrue(acquire(cache_key))
+        stored = Response({'id': 42}, status=status.HTTP_201_CREATED)
+        threading.Timer(0.1, store_response, (cache_key, request_fingerprint('POST', self.data), stored)).start()
+
+        response = self.book(self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'id': 42})
+        self.assertFalse(Booking.objects.exists())
+        release(cache_key)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.1)
+    def test_duplicate_of_a_request_still_in_flight_conflicts(self):
+        self.assertTrue(acquire(idempotency_cache_key(self.user.pk, '/booking/', 'key-1')))
+
+        response = self.book(self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error_message'], 'A request with this Idempotency-Key is still in progress')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_overlong_key_is_rejected(self):
+        response = self.book(self.data, key='k' * 256)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Booking.objects.exists())
+
+
+@override_settings(ROOT_URLCONF='cinema_project.urls_api')
+class ApiUrlconfTests(CinemaTestCase):
+
+    def test_resolves_the_api_routes(self):
+        routes = {
+            '/register/': 'user-list',
+            '/film/': 'film-list',
+            '/seance/': 'seance-list',
+            '/seance/1/': 'seance-detail',
+            '/seance/1/events/': 'seance-events',
+            '/booking/': 'booking-list',
+            '/booking/mine/': 'booking-mine',
+            '/reserve/': 'reserve-list',
+            '/hold/': 'hold-list',
+            '/room/': 'room-list',
+            '/archive/seance/': 'archived-seance-list',
+            '/schedule/': 'schedule',
+            '/instrumentation/': 'instrumentation',
+            '/reports/bookings/': 'report-export',
+        }
+        for path, view_name in routes.items():
+            with self.subTest(path=path):
+                self.assertEqual(resolve(path).view_name, view_name)
+        self.assertEqual(resolve('/login/').func.cls.__name__, 'ObtainAuthToken')
+        self.assertEqual(resolve('/logout/').func.cls.__name__, 'TokenLogoutView')
+
+    def test_leaves_out_the_admin_and_schema_views(self):
+        for path in ('/admin/', '/swagger/', '/redoc/'):
+            with self.subTest(path=path), self.assertRaises(Resolver404):
+                resolve(path)
+
+    def test_serves_requests(self):
+        response = self.client_for(self.user).get('/film/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([film['name'] for film in response.data], ['Film'])
@@ -0,0 +1,165 @@
+import abc
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from apps.task.caching import increment
+from apps.task.exceptions import InWaitingRoom
+from apps.task.idempotency import is_replay
+
+TICKET_TIMEOUT = 24 * 60 * 60
+
+_bucket_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket kept in the shared cache as ``(tokens, updated_at)``.
+
+    The read-modify-write is serialized per process only; across processes two concurrent requests can both take
+    the last token, which over-admits by at most one request per process.
+    """
+
+    def __init__(self, key, rate, burst):
+        self.key = 'bucket:{}'.format(key)
+        self.rate = rate
+        self.burst = burst
+
+    def consume(self, tokens=1):
+        """Take ``tokens`` and return 0, or return the seconds to wait until they are available."""
+        with _bucket_lock:
+            now = time.time()
+            available, updated_at = cache.get(self.key, (self.burst, now))
+            available = min(self.burst, available + (now - updated_at) * self.rate)
+            if available >= tokens:
+                available -= tokens
+                wait = 0
+            else:
+                wait = (tokens - available) / self.rate
+            cache.set(self.key, (available, now), timeout=math.ceil(self.burst / self.rate) + 1)
+        return wait
+
+
+def requested_seance_id(request):
+    try:
+        return int(request.data.get('seance'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class BookingThrottle(BaseThrottle, metaclass=abc.ABCMeta):
+    """Token bucket per ``bucket_key``; only seat-taking writes are throttled, reads and idempotent replays never
+    are. A bucket setting of ``None`` turns the throttle off.
+
+    Buckets and waiting rooms live in the default cache; on the per-process locmem cache every worker keeps its
+    own, so the effective limits grow with the number of workers.
+    """
+    setting = None
+
+    @abc.abstractmethod
+    def bucket_key(self, request, view):
+        """Cache key of the bucket this request draws from, or ``None`` to let it through."""
+
+    def allow_request(self, request, view):
+        self.delay = 0
+        bucket = getattr(settings, self.setting)
+        if request.method != 'POST' or bucket is None or is_replay(request):
+            return True
+        key = self.bucket_key(request, view)
+        if key is None:
+            return True
+        self.delay = TokenBucket(key, *bucket).consume()
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class UserBookingThrottle(BookingThrottle):
+    setting = 'BOOKING_USER_BUCKET'
+
+    def bucket_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return 'user:{}'.format(request.user.pk)
+        return 'anon:{}'.format(self.get_ident(request))
+
+
+class SeanceBookingThrottle(BookingThrottle):
+    setting = 'BOOKING_SEANCE_BUCKET'
+
+    def bucket_key(self, request, view):
+        seance_id = requested_seance_id(request)
+        return None if seance_id is None else 'seance:{}'.format(seance_id)
+
+
+class WaitingRoom:
+    """Virtual queue for a hot seance, admitting ``rate`` tickets per second after an initial ``burst``.
+
+    Admission is a pure function of the clock: ticket ``n`` is admitted at ``opened_at + (n - burst) / rate`` and
+    stays valid for WAITING_ROOM_ADMISSION_WINDOW seconds, so no process has to advance the queue.
+    """
+
+    def __init__(self, seance_id):
+        self.seance_id = seance_id
+        self.key = 'waiting-room:{}'.format(seance_id)
+
+    def open(self, rate, burst=0):
+        cache.set(self.key, {'rate': rate, 'burst': burst, 'opened_at': time.time()}, timeout=None)
+
+    def close(self):
+        cache.delete(self.key)
+
+    @property
+    def config(self):
+        return cache.get(self.key)
+
+    def ticket(self, config, user_id, reissue=False):
+        """The user's ticket, issuing the next one on their first visit or once their admission has lapsed."""
+        prefix = '{}:{}'.format(self.key, config['opened_at'])
+        ticket_key = '{}:ticket:{}'.format(prefix, user_id)
+        if reissue:
+            cache.delete(ticket_key)
+        ticket = cache.get(ticket_key)
+        if ticket is None:
+            cache.add(ticket_key, increment(prefix + ':issued'), timeout=TICKET_TIMEOUT)
+            ticket = cache.get(ticket_key)
+        return ticket
+
+    def admitted_at(self, config, ticket):
+        return config['opened_at'] + max(ticket - config['burst'], 0) / config['rate']
+
+    def status(self, user_id):
+        config = self.config
+        if config is None:
+            return None
+        now = time.time()
+        ticket = self.ticket(config, user_id)
+        if now > self.admitted_at(config, ticket) + settings.WAITING_ROOM_ADMISSION_WINDOW:
+            ticket = self.ticket(config, user_id, reissue=True)
+        admitted_at = self.admitted_at(config, ticket)
+        served = config['burst'] + (now - config['opened_at']) * config['rate']
+        return {
+            'ticket': ticket,
+            'position': max(ticket - int(served), 0),
+            'admitted': admitted_at <= now,
+            'retry_after': round(max(admitted_at - now, 0), 3),
+        }
+
+
+class WaitingRoomThrottle(BaseThrottle):
+    """Holds seat-taking writes for a seance with an open waiting room until the user's ticket is admitted."""
+
+    def allow_request(self, request, view):
+        seance_id = requested_seance_id(request)
+        if request.method != 'POST' or seance_id is None or not request.user.is_authenticated or is_replay(request):
+            return True
+        status = WaitingRoom(seance_id).status(request.user.pk)
+        if status is None or status['admitted']:
+            return True
+        raise InWaitingRoom(status)
+
+
+BOOKING_THROTTLES = (WaitingRoomThrottle, UserBookingThrottle, SeanceBookingThrottle)
@@ -1,15 +1,50 @@
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin, UpdateModelMixin
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.mixins import (
+    CreateModelMixin, DestroyModelMixin, ListModelMixin, RetrieveModelMixin, UpdateModelMixin,
+)
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 from django.contrib.auth import get_user_model
 
-from apps.task.mixins import UnbookedDestroyModelMixin
-from apps.task.models import Seance, Film, Booking, Reserve
-from apps.task.serializers import UserSerializer, SeanceSerializer, FilmSerializer, BookingSerializer, ReserveSerializer
+from apps.task.mixins import (
+    UnbookedDestroyModelMixin, CachedListModelMixin, CachedRetrieveModelMixin, ExpandableFieldsMixin,
+    IdempotentCreateMixin, ReplicaReadMixin,
+)
+from apps.task.booking import MAX_BULK_SEATS, checkout_hold
+from apps.task.instrumentation import registry
+from apps.task.models import Room, Seance, Film, Booking, Reserve, Hold, ArchivedSeance
+from apps.task.occupancy import build_seat_maps
+from apps.task.pagination import (
+    ArchivedSeanceCursorPagination, BookingCursorPagination, PastBookingCursorPagination, SeanceCursorPagination,
+    UpcomingBookingCursorPagination,
+)
+from apps.task.realtime import EventStreamRenderer, hub, sse_message
+from apps.task.recommendation import recommend_blocks
+from apps.task.reports import CONTENT_TYPES, REPORTS, export_lines
+from apps.task.schedule import get_schedule
+from apps.task.throttling import BOOKING_THROTTLES, WaitingRoom
+from apps.task.serializers import (
+    UserSerializer, SeanceSerializer, FilmSerializer, BookingSerializer, BulkBookingSerializer, ReserveSerializer,
+    HoldSerializer, SeancePlanSerializer, RoomLayoutSerializer, ReportFilterSerializer, ArchivedSeanceSerializer,
+    ScheduleQuerySerializer, WaitingRoomSerializer, QuoteSerializer, MyBookingSerializer,
+)
 
 User = get_user_model()
 
+MAX_RECOMMENDATIONS = 20
+
 
 class UserViewSet(CreateModelMixin, GenericViewSet):
     queryset = User.objects.all()
@@ -18,27 +53,147 @@ class UserViewSet(CreateModelMixin, GenericViewSet):
     permission_classes = (AllowAny, )
 
 
-class FilmViewSet(ListModelMixin, GenericViewSet):
+class RoomViewSet(CreateModelMixin, GenericViewSet):
+    queryset = Room.objects.all()
+    serializer_class = RoomLayoutSerializer
+    http_method_names = ['post', ]
+    permission_classes = (IsAdminUser, )
+
+
+class FilmViewSet(ReplicaReadMixin, CachedListModelMixin, GenericViewSet):
     queryset = Film.objects.all()
     serializer_class = FilmSerializer
     http_method_names = ['get', ]
 
 
-class SeanceViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class SeanceViewSet(ReplicaReadMixin, ExpandableFieldsMixin, CachedListModelMixin, CachedRetrieveModelMixin,
+                    GenericViewSet):
     queryset = Seance.objects.all()
     serializer_class = SeanceSerializer
-    http_method_names = ['get', ]
+    http_method_names = ['get', 'post', 'delete', ]
     permission_classes = [AllowAny, ]
     filter_backends = (DjangoFilterBackend, )
     filterset_fields = ('film_id', )
+    pagination_class = SeanceCursorPagination
+
+    def get_default_expand(self):
+        if self.action == 'retrieve':
+            return {'chairs'}
+        return set()
+
+    def get_since_version(self, request):
+        since = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('since')
+        try:
+            return int(since)
+        except (TypeError, ValueError):
+            return None
+
+    def get_snapshot(self, seance):
+        version = hub.version(seance.id)
+        return version, build_seat_maps([seance])[seance.id].chairs()
+
+    @action(detail=True, methods=['get'])
+    def recommend(self, request, pk=None):
+        try:
+            seats = int(request.query_params.get('seats', 2))
+            limit = int(request.query_params.get('limit', 5))
+        except ValueError:
+            raise ValidationError({'error_message': 'seats and limit must be integers'})
+        if not 1 <= seats <= MAX_BULK_SEATS or not 1 <= limit <= MAX_RECOMMENDATIONS:
+            raise ValidationError({'error_message': 'seats must be 1-{} and limit 1-{}'.format(
+                MAX_BULK_SEATS, MAX_RECOMMENDATIONS
+            )})
+
+        seance = self.get_object()
+        seat_map = build_seat_maps([seance])[seance.id]
+        return Response({'seance': seance.id, 'seats': seats, 'blocks': recommend_blocks(seat_map, seats, limit)})
+
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer])
+    def events(self, request, pk=None):
+        seance = self.get_object()
+        since = self.get_since_version(request)
+
+        def stream():
+            version = since
+            deadline = time.monotonic() + settings.SEAT_EVENTS_STREAM_SECONDS
+            if version is None:
+                version, chairs = self.get_snapshot(seance)
+                yield sse_message('snapshot', version, chairs)
+
+            while time.monotonic() < deadline:
+                current, changes = hub.wait(seance.id, version, settings.SEAT_EVENTS_HEARTBEAT_SECONDS)
+                if changes is None:
+                    version, chairs = self.get_snapshot(seance)
+                    yield sse_message('snapshot', version, chairs)
+                elif changes:
+                    version = current
+                    yield sse_message('delta', version, changes)
+                else:
+                    yield ': keepalive\n\n'
 
+        response = StreamingHttpResponse(stream(), content_type=EventStreamRenderer.media_type)
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
-class BookingViewSet(ListModelMixin, CreateModelMixin, UpdateModelMixin, UnbookedDestroyModelMixin, GenericViewSet):
-    queryset = Booking.objects.all()
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        seance = self.get_object()
+        since = self.get_since_version(request)
+        if since is not None:
+            version, changes = hub.wait(seance.id, since, settings.SEAT_EVENTS_HEARTBEAT_SECONDS)
+            if changes is not None:
+                return Response({'version': version, 'changes': changes})
+
+        version, chairs = self.get_snapshot(seance)
+        return Response({'version': version, 'chairs': chairs})
+
+    @action(detail=False, methods=['post'], serializer_class=SeancePlanSerializer, permission_classes=[IsAdminUser])
+    def plan(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], serializer_class=QuoteSerializer)
+    def quote(self, request, pk=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get', 'post', 'delete'], url_path='waiting-room',
+            serializer_class=WaitingRoomSerializer, permission_classes=[IsAuthenticated])
+    def waiting_room(self, request, pk=None):
+        """GET returns the caller's queue ticket without touching the database; staff open and close it."""
+        if request.method == 'GET':
+            try:
+                waiting_room = WaitingRoom(int(pk))
+            except ValueError:
+                raise ValidationError({'error_message': 'Not a seance id'})
+            return Response({'open': waiting_room.config is not None, 'queue': waiting_room.status(request.user.pk)})
+
+        if not request.user.is_staff:
+            raise PermissionDenied()
+        waiting_room = WaitingRoom(self.get_object().id)
+        if request.method == 'DELETE':
+            waiting_room.close()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        waiting_room.open(**serializer.validated_data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class BookingViewSet(ReplicaReadMixin, ExpandableFieldsMixin, ListModelMixin, IdempotentCreateMixin, UpdateModelMixin,
+                     UnbookedDestroyModelMixin, GenericViewSet):
+    queryset = Booking.objects.select_related('seance')
     serializer_class = BookingSerializer
     http_method_names = ['get', 'post', 'patch', 'delete', ]
     filter_backends = (DjangoFilterBackend, )
     filterset_fields = ('seance_id', )
+    pagination_class = BookingCursorPagination
+    throttle_classes = BOOKING_THROTTLES
+    primary_read_actions = ('mine', )
 
     def get_serializer(self, *args, **kwargs):
         serializer_class = self.get_serializer_class()
@@ -60,9 +215,120 @@ class BookingViewSet(ListModelMixin, CreateModelMixin, UpdateModelMixin, Unbooke
 
         return [permission() for permission in permission_classes]
 
+    @action(detail=False, methods=['get'], serializer_class=MyBookingSerializer)
+    def mine(self, request):
+        """The caller's bookings, ``?when=upcoming`` (default, soonest first) or ``?when=past`` (latest first)."""
+        when = request.query_params.get('when', 'upcoming')
+        if when not in ('upcoming', 'past'):
+            raise ValidationError({'error_message': 'when must be upcoming or past'})
 
-class ReserveViewSet(CreateModelMixin, GenericViewSet):
+        queryset = Booking.objects.filter(user=request.user).select_related(
+            'seat', 'seance__film', 'seance__room'
+        ).annotate(seance_date=F('seance__date'), seance_start_time=F('seance__start_time'))
+        now = timezone.now()
+        if when == 'upcoming':
+            queryset, paginator = queryset.filter(seance__ends_at__gt=now), UpcomingBookingCursorPagination()
+        else:
+            queryset, paginator = queryset.filter(seance__ends_at__lte=now), PastBookingCursorPagination()
+
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], serializer_class=BulkBookingSerializer)
+    def bulk(self, request):
+        return self.idempotent_response(self.create_bulk, request)
+
+    def create_bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ReserveViewSet(IdempotentCreateMixin, GenericViewSet):
     queryset = Reserve.objects.all()
     serializer_class = ReserveSerializer
     permission_classes = (IsAuthenticated, )
+    throttle_classes = BOOKING_THROTTLES
     http_method_names = ['post', ]
+
+
+class HoldViewSet(IdempotentCreateMixin, DestroyModelMixin, GenericViewSet):
+    queryset = Hold.objects.all()
+    serializer_class = HoldSerializer
+    permission_classes = (IsAuthenticated, )
+    throttle_classes = BOOKING_THROTTLES
+    http_method_names = ['post', 'delete', ]
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def checkout(self, request, pk=None):
+        booking = checkout_hold(self.get_object())
+        serializer = BookingSerializer(booking, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ArchivedSeanceViewSet(ExpandableFieldsMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
+    queryset = ArchivedSeance.objects.all()
+    serializer_class = ArchivedSeanceSerializer
+    permission_classes = (IsAdminUser, )
+    filter_backends = (DjangoFilterBackend, )
+    filterset_fields = ('film_id', 'room_id', 'date', )
+    pagination_class = ArchivedSeanceCursorPagination
+
+    def get_default_expand(self):
+        if self.action == 'retrieve':
+            return {'bookings'}
+        return set()
+
+    def get_queryset(self):
+        if 'bookings' in self.get_serializer_context()['expand']:
+            return self.queryset
+        return self.queryset.defer('bookings')
+
+
+class ScheduleView(APIView):
+    permission_classes = (AllowAny, )
+
+    def get(self, request):
+        serializer = ScheduleQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(get_schedule(serializer.validated_data.get('date') or timezone.localdate()))
+
+
+class TokenLogoutView(APIView):
+    permission_classes = (IsAuthenticated, )
+
+    def post(self, request):
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class InstrumentationView(APIView):
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request):
+        return Response(registry.report())
+
+    def delete(self, request):
+        registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ReportExportView(APIView):
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request, report):
+        if report not in REPORTS:
+            return Response({'error_message': 'Unknown report'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = ReportFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        export_format = serializer.validated_data['export']
+        response = StreamingHttpResponse(
+            export_lines(report, export_format, **serializer.filters), content_type=CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(report, export_format)
+        return response
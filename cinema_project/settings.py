@@ -41,10 +41,11 @@ INSTALLED_APPS = [
     'drf_yasg',
     'rest_framework.authtoken',
 
-    'apps.task',
+    'apps.task.apps.TaskConfig',
 ]
 
 MIDDLEWARE = [
+    'apps.task.middleware.DatabasePoolMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.task.middleware.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'cinema_project.urls'
@@ -78,14 +80,56 @@ WSGI_APPLICATION = 'cinema_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and pinged before reuse once idle for
+# DB_HEALTH_CHECK_SECONDS. Setting DB_REPLICA_NAME or DB_REPLICA_HOST adds a 'replica' alias that serves the GET
+# requests of the film, seance and booking viewsets; two SQLite files work for trying it locally.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'cinema_1',
-        'USER': 'root',
-        'PASSWORD': 'root',
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.mysql'),
+        'NAME': os.environ.get('DB_NAME', 'cinema_1'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'root'),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        HOST=os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_REPLICA_ALIAS = 'replica'
+DATABASE_ROUTERS = ['apps.task.database.ReplicaRouter']
+DB_HEALTH_CHECK_SECONDS = 30
+
+# Concurrent requests allowed to use the database per process; 0 leaves it unbounded
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+DB_POOL_TIMEOUT = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Catalogue versions, credential generations, the schedule generation, throttling buckets, waiting rooms and
+# idempotency keys all live in this cache and must be shared by every worker and management command. The locmem
+# default is per process and only fit for a single dev server; deployments set CACHE_BACKEND and CACHE_LOCATION,
+# e.g. django.core.cache.backends.memcached.MemcachedCache and 127.0.0.1:11211.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cinema'),
+    }
+}
+
+# Seconds a cached film/seance response may live; writes invalidate it earlier through the catalogue version
+CATALOGUE_CACHE_TIMEOUT = 300
+
+# The per-date schedule is invalidated explicitly on every seance or booking change, so it can live long
+SCHEDULE_CACHE_TIMEOUT = 60 * 60
 
 
 # Password validation
@@ -142,9 +186,10 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.BasicAuthentication',
+        'apps.task.authentication.CachedTokenAuthentication',
+        'apps.task.authentication.BearerTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.task.authentication.CachedBasicAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',)
 }
@@ -160,7 +205,52 @@ SWAGGER_SETTINGS = {
     },
 }
 
+# Seconds a successful token or password check is remembered; revoked early on logout or any user change
+AUTH_CACHE_TTL = 300
+
 LOGIN_URL = 'rest_framework:login'
 LOGOUT_URL = 'rest_framework:logout'
 
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'from@example.com'
+
+# Seconds a notification claimed by send_notifications stays in flight before another drainer may retry it
+NOTIFICATION_CLAIM_SECONDS = 5 * 60
+
+# Seconds a seat stays held for a user before the sweeper releases it
+SEAT_HOLD_TTL = 600
+
+# Seat prices per category used when neither the film nor the seance has a PriceTier for it
+DEFAULT_SEAT_PRICES = {'standard': '10.00'}
+
+# Seconds a room's seat categories stay cached for pricing; seat changes also drop the entry on commit
+ROOM_CATEGORIES_CACHE_TIMEOUT = 10 * 60
+
+# Token buckets, as (tokens per second, burst), for seat-taking POSTs per user and per seance; a seance with an
+# open waiting room admits queued users at its own rate and each admission stays valid this many seconds; None
+# turns a bucket off
+BOOKING_USER_BUCKET = (0.5, 10)
+BOOKING_SEANCE_BUCKET = (20, 100)
+WAITING_ROOM_ADMISSION_WINDOW = 120
+
+# Responses to POSTs with an Idempotency-Key are replayed for this long; a duplicate sent while the first is still
+# running waits up to IDEMPOTENCY_WAIT_SECONDS for it
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_SECONDS = 30
+IDEMPOTENCY_WAIT_SECONDS = 5
+
+# Seances older than this many days are moved to the archive tables by archive_seances
+ARCHIVE_AFTER_DAYS = 90
+
+# Seat state deltas kept per seance for reconnecting clients, seances kept per process, and how long one
+# event stream stays open
+SEAT_EVENTS_BACKLOG = 500
+SEAT_EVENTS_CHANNELS = 1000
+SEAT_EVENTS_STREAM_SECONDS = 55
+SEAT_EVENTS_HEARTBEAT_SECONDS = 15
+
+
+# Per-endpoint query/latency instrumentation, reported at /instrumentation/ and by profile_endpoints
+INSTRUMENTATION_ENABLED = DEBUG
+INSTRUMENTATION_SAMPLES = 1000
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 10
@@ -13,42 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls import url
-from django.contrib import admin
-from django.urls import path, include
-from rest_framework import routers, permissions
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework.authtoken import views
+from django.urls import URLResolver
+from django.urls.resolvers import RegexPattern
 
-from apps.task.views import UserViewSet, SeanceViewSet, FilmViewSet, BookingViewSet, ReserveViewSet
+from cinema_project.urls_api import urlpatterns as api_urlpatterns
 
-router = routers.DefaultRouter()
-router.register(r'register', UserViewSet)
-router.register(r'seance', SeanceViewSet, basename='seance')
-router.register(r'film', FilmViewSet, basename='film')
-router.register(r'booking', BookingViewSet, basename='booking')
-router.register(r'reserve', ReserveViewSet, basename='reserve')
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Snippets API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@snippets.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+def lazy_include(regex, urlconf_name):
+    """Like include(), but the urlconf module is only imported once a path matches ``regex`` (or on reverse())."""
+    return URLResolver(RegexPattern(regex, is_endpoint=False), urlconf_name)
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
-    url(r'^api-auth/', include('rest_framework.urls')),
-    url(r'^', include(router.urls)),
-    url(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    url(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    url(r'^redoc/$', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    url(r'^login/', views.obtain_auth_token)
+
+urlpatterns = api_urlpatterns + [
+    lazy_include(r'^(?=admin/|api-auth/)', 'cinema_project.urls_admin'),
+    lazy_include(r'^(?=swagger|redoc/)', 'cinema_project.urls_docs'),
 ]
@@ -0,0 +1,9 @@
+"""Admin and browsable API login views, imported on the first request for them."""
+from django.conf.urls import url
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    url(r'^api-auth/', include('rest_framework.urls')),
+]
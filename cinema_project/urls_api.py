@@ -0,0 +1,29 @@
+"""API routes only, without the admin or the schema views; the ROOT_URLCONF of settings_api."""
+from django.conf.urls import url
+from django.urls import include
+from rest_framework import routers
+from rest_framework.authtoken import views
+
+from apps.task.views import (
+    UserViewSet, SeanceViewSet, FilmViewSet, BookingViewSet, ReserveViewSet, HoldViewSet, InstrumentationView,
+    RoomViewSet, TokenLogoutView, ReportExportView, ArchivedSeanceViewSet, ScheduleView,
+)
+
+router = routers.DefaultRouter()
+router.register(r'register', UserViewSet)
+router.register(r'seance', SeanceViewSet, basename='seance')
+router.register(r'film', FilmViewSet, basename='film')
+router.register(r'booking', BookingViewSet, basename='booking')
+router.register(r'reserve', ReserveViewSet, basename='reserve')
+router.register(r'hold', HoldViewSet, basename='hold')
+router.register(r'room', RoomViewSet, basename='room')
+router.register(r'archive/seance', ArchivedSeanceViewSet, basename='archived-seance')
+
+urlpatterns = [
+    url(r'^', include(router.urls)),
+    url(r'^login/', views.obtain_auth_token),
+    url(r'^logout/', TokenLogoutView.as_view()),
+    url(r'^schedule/$', ScheduleView.as_view(), name='schedule'),
+    url(r'^instrumentation/$', InstrumentationView.as_view(), name='instrumentation'),
+    url(r'^reports/(?P<report>[a-z]+)/$', ReportExportView.as_view(), name='report-export'),
+]